@@ -1,129 +1,209 @@
+import os
+import zlib
 import traceback
-import tkinter as tk
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+from gameMetrics import metrics, startup
 import pygame
 import chess
-import chess.engine
-import chess.svg
-import re
-import datetime
+from openingBook import OpeningBook
+from endgameTablebase import EndgameTablebase
+from moveLog import MoveLog, ConsoleSink, JsonlSink, PgnSink
+from gameCore import PROMOTION_PIECES, GameSession
 
+# The engine modules (and chess.engine with asyncio) load on the engine startup thread, PGN support on first use
+startup.mark("imports")
 
-class ChessGame:
-    def __init__(self):
-        self.game_running = True  # Flag to track whether the game is running
 
-        # Create an instance of the InfoPreview class
-        self.info_preview = InfoPreview(self)
+class GameState:
+    PLAYING = "Playing"
+    GAME_OVER = "GameOver"
+    PROMOTION = "Promotion"
+    DIALOG = "Dialog"  # Waiting for a click on the option dialog
+    RESTARTING = "Restarting"
+    EXITING = "Exiting"
 
-        # Create an instance of the Hint class and pass the InfoPreview instance
-        self.hint = Hint(self, self.info_preview)
 
-        pygame.init()  # Initialize Pygame
-        pygame.font.init()  # Initialize Pygame's font module
+class ChessGame:
+    def __init__(self):
+        self.game_running = True  # Flag to track whether the game is running
+        self.state = GameState.PLAYING  # Drives the single loop in run()
+        self.pending_promotion = None  # Pawn move waiting for the promotion choice
+        self.resigned_player = None
+
+        # Move records are buffered and written by a background thread, sinks can be added for files
+        self.move_log = MoveLog([ConsoleSink()])
+
+        # Rules, history and outcome live in the session, this window draws it and feeds it clicks
+        self.session = GameSession(move_log=self.move_log)
+        self.session.listeners.append(self.position_changed)
+        self.info_preview = self.session.info_preview
+
+        # Syzygy tables for exact endgame moves and results, Stockfish probes the same files
+        with startup.phase("tablebase"):
+            self.tablebase = EndgameTablebase.open(os.environ.get("SYZYGY_PATH", "src_files/syzygy"))
+        self.tablebase_wdl = None  # Result of the current position from the tables, None outside them
+        self.adjudicate_endgames = True  # End the game once the tables know the result
+        self.tablebase_declined = False  # Player closed the tablebase result dialog this game
+
+        # Polyglot book asked before the engine, optional
+        with startup.phase("opening book"):
+            self.opening_book = OpeningBook.open("src_files/opening_book.bin")
+
+        # Engine, analysis cache and pool are set by start_engine, the board is drawn without waiting for them
+        self.engine_path = None
+        self.engine_pool = None
+        self.analysis_cache = None
+        self.engine_lock = threading.Lock()
+        self.closing = False
+
+        # Book and tablebase hints work at once, engine hints queue until the engine is ready
+        self.hint = Hint(self, self.info_preview, None, None, self.opening_book, self.tablebase)
+
+        self.engine_thread = threading.Thread(target=self.start_engine, name="engine-startup", daemon=True)
+        self.engine_thread.start()
+
+        with startup.phase("pygame init"):
+            pygame.init()  # Initialize Pygame
+            pygame.font.init()  # Initialize Pygame's font module
 
         self.clock = pygame.time.Clock()
+        self.max_fps = 60  # Cap while frames are being drawn
+        self.idle_timeout = 1000  # Milliseconds to sleep in event.wait when nothing changes
 
         # Calculate the dynamic board size based on the smaller screen dimension
         screen_info = pygame.display.Info()
         smaller_dimension = min(screen_info.current_w, screen_info.current_h - 100)
         self.board_size = smaller_dimension - 100  # You can adjust the padding as needed
 
-        label_space = 30  # Space for smaller labels on each side
+        self.label_space = 30  # Space for smaller labels on each side
 
         # Create a larger surface to include space for labels
-        self.screen = pygame.display.set_mode((self.board_size + label_space, self.board_size + label_space))
-        pygame.display.set_caption("Chess Game")
-
-        # Create a history list to store move details
-        self.move_history = []
+        with startup.phase("window"):
+            self.screen = pygame.display.set_mode((self.board_size + self.label_space,
+                                                   self.board_size + self.label_space), pygame.RESIZABLE)
+            pygame.display.set_caption("Chess Game")
 
         # For undo, redo
         self.UNDO_EVENT = pygame.USEREVENT + 1
         self.REDO_EVENT = pygame.USEREVENT + 2
+        self.GAME_END_EVENT = pygame.USEREVENT + 4  # Posted when a position change ends the game
 
         # Define custom event types for undo and redo
         self.undo_event = pygame.event.Event(self.UNDO_EVENT)
         self.redo_event = pygame.event.Event(self.REDO_EVENT)
 
-        self.undo_stack = []
-        self.redo_stack = []
-
-        self.redo_steps = []  # New list to store redo steps
-
-        # Load chess piece images
-        self.piece_images = {
-            chess.Piece(chess.KING, chess.WHITE): pygame.image.load("src_images/small sizes/King-Gold.png"),
-            chess.Piece(chess.KING, chess.BLACK): pygame.image.load("src_images/small sizes/King-Silver.png"),
+        # Load chess piece images once, converted and scaled to the square size
+        with startup.phase("sprites"):
+            self.sprite_atlas = SpriteAtlas("src_images/small sizes", "src_files/sprite_cache")
+            self.piece_images = self.sprite_atlas.build(self.board_size / 8, persist=True)
 
-            chess.Piece(chess.QUEEN, chess.WHITE): pygame.image.load("src_images/small sizes/Queen-Gold.png"),
-            chess.Piece(chess.QUEEN, chess.BLACK): pygame.image.load("src_images/small sizes/Queen-Silver.png"),
+        # Fonts are looked up once, rendered text is reused across frames
+        with startup.phase("fonts"):
+            self.text_cache = TextCache('arial')  # You can change 'arial' to another font name
 
-            chess.Piece(chess.ROOK, chess.WHITE): pygame.image.load("src_images/small sizes/Rook-Gold.png"),
-            chess.Piece(chess.ROOK, chess.BLACK): pygame.image.load("src_images/small sizes/Rook-Silver.png"),
+            # Initialize font for options
+            self.font = self.text_cache.font(36, default=True)
 
-            chess.Piece(chess.BISHOP, chess.WHITE): pygame.image.load("src_images/small sizes/Bishop-Gold.png"),
-            chess.Piece(chess.BISHOP, chess.BLACK): pygame.image.load("src_images/small sizes/Bishop-Silver.png"),
-
-            chess.Piece(chess.KNIGHT, chess.WHITE): pygame.image.load("src_images/small sizes/Knight-Gold.png"),
-            chess.Piece(chess.KNIGHT, chess.BLACK): pygame.image.load("src_images/small sizes/Knight-Silver.png"),
-
-            chess.Piece(chess.PAWN, chess.WHITE): pygame.image.load("src_images/small sizes/Pawn-Gold.png"),
-            chess.Piece(chess.PAWN, chess.BLACK): pygame.image.load("src_images/small sizes/Pawn-Silver.png"),
-        }
-
-        # Initialize font for options
-        self.font = pygame.font.Font(None, 36)
-
-        # Create an instance of the OptionDialog class
-        self.option_dialog = OptionDialog()
+        # Dialogs are drawn over the board by the renderer
+        self.option_dialog = OptionDialog(self)
 
         self.WHITE = (239, 223, 197)
         self.BLACK = (90, 61, 41)
 
         self.current_player = None
 
-        self.board = chess.Board()
+        # Same objects as the session's, refreshed in position_changed when a game is reset or loaded
+        self.board = self.session.board
+        self.history = self.session.history
+
+        # Games opened from a PGN file, stepped through with undo/redo
+        self.database = None
+        self.game_number = None
         self.selected_piece = None
         self.target_square = None
         self.response = None
 
         self.selected_option = None
-        self.valid_moves = []
+        self.valid_moves = chess.SquareSet()
+        self.outcome = None  # chess.Outcome of the current position, updated by position_changed only
+        self.position_info = self.session.get_position_info()  # Attacks, checks and pins for the renderer
         self.responseAcknowledge = False
+
+        # Retained-mode renderer, only repaints squares that changed
+        self.renderer = BoardRenderer(self)
         print("Step Condition True")
 
+    def start_engine(self):
+        # Runs on its own thread so the window shows up while Stockfish is located, built or started.
+        # Warm Stockfish processes shared by every engine consumer (hints, auto-play, analysis),
+        # the built-in search engine takes over when the binary is missing
+        engine_path = engine_pool = analysis_cache = None
+        try:
+            with startup.phase("engine imports"):
+                from engineLocator import EngineLocator
+                from enginePool import EnginePool
+                from analysisCache import AnalysisCache
+
+            # Configured or installed Stockfish, otherwise a build of the bundled source for this CPU
+            with startup.phase("engine locate"):
+                engine_path, engine_options = EngineLocator().locate()
+            if self.tablebase:
+                engine_options.update(self.tablebase.engine_options())
+
+            with startup.phase("engine start"):
+                engine_pool = EnginePool.open(engine_path, size=1, threads=1, hash_size=16,
+                                              options={"Skill Level": 10, **engine_options}, fallback=True)
+
+            # Hint results by position, kept on disk so known positions skip Stockfish next launch
+            with startup.phase("analysis cache"):
+                analysis_cache = AnalysisCache(max_entries=4096, path="src_files/analysis_cache.db")
+        except Exception as e:
+            # Nothing else would report it from this thread, book and tablebase hints keep working
+            print("Error: Engine startup failed, no engine hints available\n", e)
+            print(traceback.format_exc())
+            if engine_pool is not None:
+                engine_pool.close()
+            engine_pool = analysis_cache = None
+
+        with self.engine_lock:
+            if self.closing:
+                # The window was closed while the engine was starting
+                if engine_pool is not None:
+                    engine_pool.close()
+                if analysis_cache is not None:
+                    analysis_cache.close()
+                return
+            self.engine_path = engine_path
+            self.engine_pool = engine_pool
+            self.analysis_cache = analysis_cache
+        # Always attached, even without an engine, so queued hint requests are answered or dropped
+        self.hint.attach_engine(engine_pool, analysis_cache)
+        startup.mark("engine ready" if engine_pool is not None else "engine failed")
+
+    def get_move_index(self):
+        return self.session.get_move_index()
+
     def calculate_valid_moves(self, selected_square):
-        valid_moves = []
-        if self.board.piece_at(selected_square):
-            for move in self.board.legal_moves:
-                if move.from_square == selected_square:
-                    valid_moves.append(move.to_square)
-                    if (
-                            self.board.piece_at(selected_square).piece_type == chess.PAWN and
-                            (chess.square_rank(move.to_square) == 0 or chess.square_rank(move.to_square) == 7)
-                    ):
-                        valid_moves.append(move.to_square + chess.QUEEN)
-                        valid_moves.append(move.to_square + chess.ROOK)
-                        valid_moves.append(move.to_square + chess.BISHOP)
-                        valid_moves.append(move.to_square + chess.KNIGHT)
-        return valid_moves
+        return self.get_move_index().destinations(selected_square)
 
     def initialize_game(self):
         # Initialize or reset your game state here
-        self.board = chess.Board()  # Initialize the game board as a chess.Board object
         self.current_player = "white"  # Set the starting player
         self.selected_piece = None  # Store the currently selected piece
         self.target_square = None
         self.response = None
         self.selected_option = None
         self.responseAcknowledge = False
-        self.move_history = []
-        self.valid_moves = []  # Store valid moves for the selected piece
-        self.undo_stack = []
-        self.redo_stack = []
-        self.redo_steps = []
+        self.valid_moves = chess.SquareSet()  # Store valid moves for the selected piece
+        self.pending_promotion = None
+        self.resigned_player = None
+        self.tablebase_declined = False
 
-        self.info_preview.count = 0
+        self.session.reset()  # New board, position_changed runs from the session
+        self.renderer.invalidate(full=True)
         # ... other game state variables ...
 
     def get_piece_at_square(self, row, col):
@@ -160,159 +240,324 @@ class ChessGame:
         self.selected_option = None
 
         # Resume the game loop
-        self.run()
+        self.state = GameState.PLAYING
 
     def run(self):
+        # Single top-level loop, dialogs and restarts change the state instead of nesting another loop
         try:
-            while self.game_running:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        self.quit_game()  # Call the quit_game method to exit the game
-                        self.info_preview.StateArrange("Abandoned")
+            self.state = GameState.PLAYING
+            self.update_display()
+            startup.mark("first frame")
+
+            self.last_poll = time.perf_counter()
+            while self.state != GameState.EXITING:
+                if self.state in (GameState.PLAYING, GameState.DIALOG):
+                    self.play_frame()
+                elif self.state == GameState.PROMOTION:
+                    self.promotion_step()
+                elif self.state == GameState.GAME_OVER:
+                    self.game_over_step()
+                elif self.state == GameState.RESTARTING:
+                    self.restart_game()
+
+            pygame.quit()
+
+        except Exception as e:
+            print("Error: ", e)
+            print(traceback.format_exc())
+        finally:
+            self.move_log.close()  # Write out whatever is still buffered
+
+    def play_frame(self):
+        if self.renderer.is_idle():
+            # Nothing to draw, sleep until input or a hint result wakes the loop
+            events = [pygame.event.wait(self.idle_timeout)]
+        else:
+            self.clock.tick(self.max_fps)
+
+            # Event-loop lag, how long input could have waited before being seen
+            now = time.perf_counter()
+            metrics.observe("event_loop_lag_seconds", now - self.last_poll)
+            events = []
+        self.last_poll = time.perf_counter()
+
+        for event in events + pygame.event.get():
+            self.handle_event(event)
+
+        self.update_display()
+
+        if self.state != GameState.PLAYING:
+            return
+
+        if not self.responseAcknowledge:
+            # Cached per position, a steady frame generates no moves
+            if self.outcome is not None or (self.adjudicate_endgames and self.tablebase_wdl is not None
+                                            and not self.tablebase_declined):
+                self.state = GameState.GAME_OVER
+
+        elif self.selected_piece or self.target_square:
+            self.responseAcknowledge = False
+        else:
+            pass
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.quit_game()  # Call the quit_game method to exit the game
+            self.info_preview.StateArrange("Abandoned")
+
+        elif event.type == pygame.VIDEORESIZE:
+            self.resize(event.w, event.h)
 
-                    elif event.type == pygame.MOUSEBUTTONDOWN:
-                        self.handle_mouse_click(event)
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            # Window was uncovered (e.g. by a dialog), repaint everything
+            self.renderer.invalidate(full=True)
 
-                    elif event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:  # Ctrl + Z for Undo
-                            self.undo()
+        elif event.type == self.GAME_END_EVENT:
+            self.responseAcknowledge = False  # A new ending is announced even if an earlier one was dismissed
 
-                        elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:  # Ctrl + Y for Redo
-                            self.redo()
+        elif event.type == Hint.HINT_EVENT:
+            self.hint.show_hint(event)
 
-                        elif event.key == pygame.K_h:  # Press 'H' for Hint
-                            self.hint.handle_hint()  # Call the hint method
+        elif self.option_dialog.handle_event(event):
+            pass  # Clicks, drags and keys for the open dialog
 
-                        # Check for resignation
-                        elif event.key == pygame.K_r:
-                            self.resign()
+        elif self.state != GameState.PLAYING:
+            pass  # A dialog is pending, ignore board input until it is answered
 
-                self.update_display()
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            self.handle_mouse_click(event)
 
-                if not self.responseAcknowledge:
-                    if self.board.is_game_over():
-                        if self.board.is_checkmate():
-                            winner = ("white" if self.board.turn == chess.BLACK else "black")
-                            options = ["Restart", "Exit"]
-                            self.info_preview.StateArrange("Check Mate", player=winner.capitalize())
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:  # Ctrl + Z for Undo
+                self.undo()
 
-                            self.response = (self.option_dialog.display_message_with_options(
-                                f"{winner.capitalize()} player won!", '', options))
+            elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:  # Ctrl + Y for Redo
+                self.redo()
 
-                        elif self.board.is_fivefold_repetition():
-                            options = ["Restart", "Exit"]
-                            self.info_preview.StateArrange("Drawn")
+            elif event.key == pygame.K_b and event.mod & pygame.KMOD_CTRL:  # Ctrl + B for other redo line
+                self.switch_branch()
 
-                            self.response = (self.option_dialog.display_message_with_options(
-                                "Match Drawn !", "Fivefold Repetition", options))
+            elif event.key == pygame.K_PAGEDOWN and self.database:  # Next game of the PGN file
+                self.load_game(self.game_number + 1)
 
-                        elif self.board.is_stalemate():
-                            stalemated = ("Black" if self.board.turn == chess.BLACK else "White")
-                            options = ["Restart", "Exit"]
-                            self.info_preview.StateArrange("Stalemate")
+            elif event.key == pygame.K_PAGEUP and self.database:  # Previous game of the PGN file
+                self.load_game(self.game_number - 1)
 
-                            self.response = (self.option_dialog.display_message_with_options(
-                                "Match Drawn",
-                                f"{stalemated} Stalemate !",
-                                options))
+            elif event.key == pygame.K_h:  # Press 'H' for Hint
+                self.hint.handle_hint()  # Queue a background hint request
 
-                        elif self.board.is_insufficient_material():
-                            options = ["Restart", "Exit"]  # You can add more options here if needed
-                            self.info_preview.StateArrange("ins_met")
+            elif event.key == pygame.K_a:  # Squares the opponent attacks
+                self.renderer.toggle_overlay("attacks")
 
-                            self.response = self.option_dialog.display_message_with_options(
-                                f"Match Drawn ! ", "Insufficient Material", options)
+            elif event.key == pygame.K_u:  # Unprotected pieces under attack
+                self.renderer.toggle_overlay("hanging")
 
-                        elif self.board.is_fifty_moves():
-                            options = ["Restart", "Exit"]  # You can add more options here if needed
-                            self.info_preview.StateArrange("fifty_moves")
+            elif event.key == pygame.K_p:  # Pieces pinned to their king
+                self.renderer.toggle_overlay("pins")
 
-                            self.response = self.option_dialog.display_message_with_options(
-                                "Match Drawn ! ", "Fifty Moves", options)
+            # Check for resignation
+            elif event.key == pygame.K_r:
+                self.resign()
 
-                        if self.response == "Cancel":
-                            self.responseAcknowledge = True
-                            self.selected_piece = None
+    def promotion_step(self):
+        # Display a pawn promotion dialog and let the player choose a piece
+        options = ["Queen", "Rook", "Bishop", "Knight"]  # Add more options if needed
+        self.option_dialog.display_message_with_options("Pawn Promotion", "Promote to", options,
+                                                        self.promotion_answered)
+        self.state = GameState.DIALOG
+
+    def promotion_answered(self, promotion_piece):
+        move = self.pending_promotion
+        self.pending_promotion = None
+        self.perform_pawn_promotion(move, promotion_piece)
+
+        self.selected_piece = None
+        self.target_square = None
+        self.renderer.invalidate()
+        self.state = GameState.PLAYING
 
-                        # You can then check the response and take appropriate actions based on the player's choice
-                        self.GameStatus()
+    def game_over_step(self):
+        self.response = None
+        if self.resigned_player:
+            winner = "White" if self.resigned_player == "black" else "Black"
+            options = ["Restart", "Exit"]  # You can add more options here if needed
+            self.option_dialog.display_message_with_options("Resigned", f"{winner} player Won !", options,
+                                                            self.game_over_answered)
 
-                elif self.selected_piece or self.target_square:
-                    self.responseAcknowledge = False
+        else:
+            termination = self.outcome.termination if self.outcome else None
+            if termination == chess.Termination.CHECKMATE:
+                winner = "white" if self.outcome.winner == chess.WHITE else "black"
+                options = ["Restart", "Exit"]
+                self.info_preview.StateArrange("Check Mate", player=winner.capitalize())
+
+                self.option_dialog.display_message_with_options(
+                    f"{winner.capitalize()} player won!", '', options, self.game_over_answered)
+
+            elif termination == chess.Termination.FIVEFOLD_REPETITION:
+                options = ["Restart", "Exit"]
+                self.info_preview.StateArrange("Drawn")
+
+                self.option_dialog.display_message_with_options(
+                    "Match Drawn !", "Fivefold Repetition", options, self.game_over_answered)
+
+            elif termination == chess.Termination.STALEMATE:
+                stalemated = ("Black" if self.board.turn == chess.BLACK else "White")
+                options = ["Restart", "Exit"]
+                self.info_preview.StateArrange("Stalemate")
+
+                self.option_dialog.display_message_with_options(
+                    "Match Drawn",
+                    f"{stalemated} Stalemate !",
+                    options, self.game_over_answered)
+
+            elif termination == chess.Termination.INSUFFICIENT_MATERIAL:
+                options = ["Restart", "Exit"]  # You can add more options here if needed
+                self.info_preview.StateArrange("ins_met")
+
+                self.option_dialog.display_message_with_options(
+                    f"Match Drawn ! ", "Insufficient Material", options, self.game_over_answered)
+
+            elif termination == chess.Termination.SEVENTYFIVE_MOVES:
+                options = ["Restart", "Exit"]  # You can add more options here if needed
+                self.info_preview.StateArrange("fifty_moves")
+
+                self.option_dialog.display_message_with_options(
+                    "Match Drawn ! ", "Fifty Moves", options, self.game_over_answered)
+
+            elif self.tablebase_wdl is not None:
+                options = ["Restart", "Exit"]
+                if abs(self.tablebase_wdl) == 2:
+                    # Side to move wins with 2, loses with -2
+                    winner = "white" if (self.tablebase_wdl > 0) == (self.board.turn == chess.WHITE) else "black"
+                    self.info_preview.StateArrange("tablebase", player=winner.capitalize())
+
+                    self.option_dialog.display_message_with_options(
+                        f"{winner.capitalize()} player won!", "Tablebase Win", options, self.game_over_answered)
                 else:
-                    pass
+                    self.info_preview.StateArrange("tablebase")
 
-            pygame.quit()
+                    self.option_dialog.display_message_with_options(
+                        "Match Drawn ! ", "Tablebase Draw", options, self.game_over_answered)
 
-        except Exception as e:
-            print("Error: ", e)
-            print(traceback.format_exc())
+            else:
+                self.game_over_answered(None)  # Nothing to announce
+                return
+
+        self.state = GameState.DIALOG
+
+    def game_over_answered(self, response):
+        self.response = response
+        if self.resigned_player:
+            if self.response != "Cancel":
+                self.info_preview.StateArrange("resign", player=self.resigned_player)
+            self.resigned_player = None
+
+        if self.response in ("Cancel", None):
+            if self.tablebase_wdl is not None and self.outcome is None:
+                self.tablebase_declined = True  # Play the known endgame out
+            self.responseAcknowledge = True
+            self.selected_piece = None
+            self.renderer.invalidate()
+
+        # You can then check the response and take appropriate actions based on the player's choice
+        self.GameStatus()
+
+    def resize(self, width, height):
+        # Keep the board square, labels take the remaining strip
+        self.board_size = max(min(width, height) - self.label_space, 8 * 16)
+        self.screen = pygame.display.set_mode((self.board_size + self.label_space, self.board_size + self.label_space),
+                                              pygame.RESIZABLE)
+        self.piece_images = self.sprite_atlas.build(self.board_size / 8)
+        self.option_dialog.rect.clamp_ip(self.screen.get_rect())
+        self.renderer.background = None
+        self.renderer.invalidate(full=True)
 
     def quit_game(self):
+        with self.engine_lock:
+            self.closing = True  # An engine still starting closes itself
         if self.hint:
-            self.hint.close_engine()  # Close the engine before exiting
+            self.hint.close_engine()  # Stop hint analysis before exiting
+        if self.engine_pool:
+            self.engine_pool.close()  # Close the engines before exiting
+        if self.analysis_cache:
+            self.analysis_cache.close()
+        if self.opening_book:
+            self.opening_book.close()
+        if self.tablebase:
+            self.tablebase.close()
         self.game_running = False  # Set the flag to exit the game
+        self.state = GameState.EXITING
 
     def resign(self):
-        resigned_player = "black" if self.board.turn == chess.BLACK else "white"
-        winner = "White" if resigned_player == "black" else "Black"
-        options = ["Restart", "Exit"]  # You can add more options here if needed
-        self.response = self.option_dialog.display_message_with_options("Resigned", f"{winner} player Won !", options)
-
-        if self.response != "Cancel":
-            self.info_preview.StateArrange("resign", player=resigned_player)
-
-        self.GameStatus()
+        self.resigned_player = "black" if self.board.turn == chess.BLACK else "white"
+        self.state = GameState.GAME_OVER
 
     def GameStatus(self):
         if self.response == "Restart":
-            self.restart_game()
+            self.state = GameState.RESTARTING
         elif self.response == "Exit":
             self.quit_game()
         else:
-            self.run()
-
-    # It is intended to retrieve a snapshot of the current game state.
-    def get_game_state_snapshot(self):
-        return self.board.fen()
+            self.state = GameState.PLAYING
 
-    def restore_game_state(self, fen):
-        self.board.set_fen(fen)
-        # Update other game state variables if needed
+    def position_changed(self):
+        # Session listener, runs after every move, undo, redo, reset and load
+        self.board = self.session.board
+        self.history = self.session.history
 
-    def record_moved(self, move_details):
-        self.move_history.append(move_details)  # Record the move in move_history
+        # Any hint still being computed is for the old position
+        self.hint.cancel()
+        self.tablebase_wdl = self.tablebase.probe_wdl(self.board) if self.tablebase else None
+        self.position_info = self.session.get_position_info()
 
-    def record_to_move(self, lst_move):
-        self.redo_steps.append(lst_move)
+        # Outcome once per position change, published when the game has just ended
+        finished = self.outcome is not None
+        self.outcome = self.session.get_outcome()
+        if self.outcome is not None and not finished:
+            pygame.event.post(pygame.event.Event(self.GAME_END_EVENT, outcome=self.outcome))
+        self.renderer.invalidate()
 
     def undo(self):
-        if len(self.undo_stack) > 0:
-            current_game_state = self.get_game_state_snapshot()
-            self.redo_stack.append(current_game_state)  # Push the current game state onto redo stack
-            restored_game_state = self.undo_stack.pop()
-            self.restore_game_state(restored_game_state)
+        self.session.undo()
 
-            last_move = self.move_history.pop()
-            self.record_to_move(last_move)
+    def redo(self):
+        self.session.redo()
 
-            self.info_preview.moveDetails(last_move['move'], pieceAct="undone")
-        else:
-            pass
+    def switch_branch(self):
+        if self.session.switch_branch():
+            print(f"[{self.info_preview.AtNow()}] Switched redo line, next redo : {self.history.redo_line[-1].move}")
 
-    def redo(self):
-        if len(self.redo_stack) > 0:
-            current_game_state = self.get_game_state_snapshot()
-            self.undo_stack.append(current_game_state)  # Push the current game state onto undo stack
-            restored_game_state = self.redo_stack.pop()
-            self.restore_game_state(restored_game_state)
+    def open_database(self, path, game_number=0):
+        from pgnDatabase import PgnDatabase  # chess.pgn is only loaded when a PGN file is opened
 
-            next_move = self.redo_steps.pop()
-            self.record_moved(next_move)
+        self.database = PgnDatabase.open(path)
+        print(f"👉   [{self.info_preview.AtNow()}] {len(self.database)} games in {path}")
+        if len(self.database):
+            self.load_game(game_number)
 
-            self.info_preview.moveDetails(next_move['move'], pieceAct="redone")
-        else:
-            pass
+    def load_game(self, number):
+        if not 0 <= number < len(self.database):
+            return
+        game = self.database.read_game(number)
+        if game is None:
+            return
+
+        self.game_number = number
+        self.selected_piece = None
+        self.target_square = None
+        self.responseAcknowledge = False
+        self.tablebase_declined = False
+
+        # Rewound to the start, Ctrl + Y steps through the main line and Ctrl + B switches to variations
+        self.session.load_game(game)
+        self.renderer.invalidate(full=True)
+
+        headers = game.headers
+        pygame.display.set_caption(f"Chess Game - {number + 1}/{len(self.database)} : "
+                                   f"{headers.get('White', '?')} vs {headers.get('Black', '?')} "
+                                   f"{headers.get('Result', '*')}")
+        print(f"👉   [{self.info_preview.AtNow()}] Game {number + 1} loaded, {len(self.history.redo_line)} moves")
 
     def handle_mouse_click(self, event):
         if event.button == 1:
@@ -332,234 +577,518 @@ class ChessGame:
                 self.target_square = square
                 move = chess.Move(self.selected_piece, self.target_square)
 
-                if move.to_square in self.valid_moves:
-                    # Check for pawn promotion or not
-                    if (
-                            self.board.piece_at(self.selected_piece).piece_type == chess.PAWN and
-                            (chess.square_rank(move.to_square) == 0 or chess.square_rank(move.to_square) == 7)
-                    ):
-                        self.perform_pawn_promotion(move)
-                    else:
-                        # Check if the move is legal based on standard chess rules
-                        if self.board.is_legal(move):
-
-                            if self.board.is_castling(move):
-                                self.info_preview.moveDetails(move, self.board.piece_at(self.selected_piece),
-                                                              pieceAct="Castle")
-                            else:
-                                self.info_preview.moveDetails(move, self.board.piece_at(self.selected_piece))
-
-                            # Store the current game state for undo
-                            self.undo_stack.append(self.get_game_state_snapshot())
-
-                            move_details = {
-                                "move": move,
-                                "game_state": self.get_game_state_snapshot()
-                            }
-                            # Store the move details for future undo
-                            self.record_moved(move_details)
-
-                            self.info_preview.capturedDetector(move)
-
-                            self.board.push(move)
-
-                            # Post the custom undo event
-                            pygame.event.post(self.undo_event)
-                        else:
-                            print("Illegal move: Standard chess rules violation")
+                if self.get_move_index().is_promotion(move.from_square, move.to_square):
+                    # Ask for the piece from the main loop, the selection stays highlighted meanwhile
+                    self.pending_promotion = move
+                    self.state = GameState.PROMOTION
+                    self.renderer.invalidate()
+                    return
+
+                if self.apply_move(move) is not None:
                     self.selected_piece = None
                     self.target_square = None
 
-    def perform_pawn_promotion(self, move):
-        # Display a pawn promotion dialog and let the player choose a piece
-        options = ["Queen", "Rook", "Bishop", "Knight"]  # Add more options if needed
-        self.option_dialog.response = None  # Reset the response attribute
-        promotion_piece = self.option_dialog.display_message_with_options("Pawn Promotion", "Promote to", options)
-
-        if promotion_piece:
-            # Determine the color of the promoted piece
-            piece_color = self.board.piece_at(move.from_square).color
-
-            # Determine the promoted piece based on the player's choice
-            promoted_piece = None
-            if promotion_piece == "Queen":
-                promoted_piece = chess.Piece(chess.QUEEN, piece_color)
-            elif promotion_piece == "Rook":
-                promoted_piece = chess.Piece(chess.ROOK, piece_color)
-            elif promotion_piece == "Bishop":
-                promoted_piece = chess.Piece(chess.BISHOP, piece_color)
-            elif promotion_piece == "Knight":
-                promoted_piece = chess.Piece(chess.KNIGHT, piece_color)
-            else:
-                pass
-
-            if promoted_piece is not None:
-                self.info_preview.moveDetails(move, self.board.piece_at(self.selected_piece), pieceAct=promoted_piece)
-                self.info_preview.capturedDetector(move)
-
-                # Store the current game state for undo
-                self.undo_stack.append(self.get_game_state_snapshot())
+            # Selection or position changed, let the renderer work out which squares to repaint
+            self.renderer.invalidate()
 
-                # Remove the original pawn from the board
-                self.board.remove_piece_at(move.from_square)
+    def perform_pawn_promotion(self, move, promotion_piece):
+        # A real promotion move, undo/redo and the move stack stay consistent
+        piece_type = PROMOTION_PIECES.get(promotion_piece)
+        if piece_type is not None:
+            self.apply_move(chess.Move(move.from_square, move.to_square, promotion=piece_type))
 
-                # Update the board with the promoted piece
-                self.board.set_piece_at(move.to_square, promoted_piece)
+    def apply_move(self, move):
+        # Clicks, promotions and the computer player, the session checks, logs and pushes the move
+        record = self.session.apply_move(move)
+        if record is not None:
+            pygame.event.post(self.undo_event)
+        return record
 
-                # Record move details for pawn promotion
-                move_details = {
-                    "move": move,
-                    "game_state": self.get_game_state_snapshot()
-                }
-                self.record_moved(move_details)
+    def update_display(self):
+        self.renderer.draw()
+
+
+class TextCache:
+    def __init__(self, font_name, max_surfaces=512):
+        # System font lookup is slow, do it once at startup
+        self.font_path = pygame.font.match_font(font_name)
+        self.fonts = {}  # (size, default) -> pygame.font.Font
+        self.surfaces = OrderedDict()  # (text, size, color, antialias) -> rendered surface
+        self.max_surfaces = max_surfaces
+
+    def font(self, size, default=False):
+        key = (size, default)
+        if key not in self.fonts:
+            self.fonts[key] = pygame.font.Font(None if default else self.font_path, size)
+        return self.fonts[key]
+
+    def render(self, text, size, color, antialias=True):
+        key = (text, size, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font(size).render(text, antialias, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_surfaces:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+
+class SpriteAtlas:
+    PIECE_FILES = {
+        chess.Piece(chess.KING, chess.WHITE): "King-Gold.png",
+        chess.Piece(chess.KING, chess.BLACK): "King-Silver.png",
+        chess.Piece(chess.QUEEN, chess.WHITE): "Queen-Gold.png",
+        chess.Piece(chess.QUEEN, chess.BLACK): "Queen-Silver.png",
+        chess.Piece(chess.ROOK, chess.WHITE): "Rook-Gold.png",
+        chess.Piece(chess.ROOK, chess.BLACK): "Rook-Silver.png",
+        chess.Piece(chess.BISHOP, chess.WHITE): "Bishop-Gold.png",
+        chess.Piece(chess.BISHOP, chess.BLACK): "Bishop-Silver.png",
+        chess.Piece(chess.KNIGHT, chess.WHITE): "Knight-Gold.png",
+        chess.Piece(chess.KNIGHT, chess.BLACK): "Knight-Silver.png",
+        chess.Piece(chess.PAWN, chess.WHITE): "Pawn-Gold.png",
+        chess.Piece(chess.PAWN, chess.BLACK): "Pawn-Silver.png",
+    }
+
+    def __init__(self, image_dir, cache_dir=None):
+        self.image_dir = image_dir
+        self.cache_dir = cache_dir
+        self.sources = {}  # Decoded PNGs, only loaded when no cached sheet fits
+        self.sheet = None  # All twelve sprites side by side in one surface
+        self.sprite_size = None
+
+    def source_key(self):
+        # Changes whenever a source image is replaced
+        stamp = ""
+        for file_name in self.PIECE_FILES.values():
+            stat = os.stat(os.path.join(self.image_dir, file_name))
+            stamp += f"{file_name}:{stat.st_size}:{stat.st_mtime_ns};"
+        return f"{zlib.crc32(stamp.encode()):08x}"
+
+    def cache_path(self, sprite_size):
+        return os.path.join(self.cache_dir, f"atlas-{sprite_size}-{self.source_key()}.rgba")
+
+    def build(self, square_size, persist=False):
+        # Only the startup size goes through the disk cache, sizes passed while resizing stay in memory
+        sprite_size = max(int(square_size * 0.9), 1)  # Leave a little margin inside the square
+        if sprite_size != self.sprite_size:
+            cached = self.load_cached(sprite_size) if persist else None
+            self.sheet = cached or self.render_sheet(sprite_size)
+            if persist and cached is None:
+                self.store(sprite_size)
+            self.sprite_size = sprite_size
+
+        return {piece: self.sheet.subsurface(pygame.Rect(index * sprite_size, 0, sprite_size, sprite_size))
+                for index, piece in enumerate(self.PIECE_FILES)}
+
+    def load_cached(self, sprite_size):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.cache_path(sprite_size), "rb") as cache_file:
+                data = cache_file.read()
+            sheet_size = (sprite_size * len(self.PIECE_FILES), sprite_size)
+            return pygame.image.frombytes(data, sheet_size, "RGBA").convert_alpha()
+        except (OSError, ValueError):
+            return None  # Missing or stale cache, decode the PNGs instead
+
+    def render_sheet(self, sprite_size):
+        sheet = pygame.Surface((sprite_size * len(self.PIECE_FILES), sprite_size), pygame.SRCALPHA).convert_alpha()
+        for index, (piece, file_name) in enumerate(self.PIECE_FILES.items()):
+            if piece not in self.sources:
+                self.sources[piece] = pygame.image.load(os.path.join(self.image_dir, file_name)).convert_alpha()
+            sprite = pygame.transform.smoothscale(self.sources[piece], (sprite_size, sprite_size))
+            sheet.blit(sprite, (index * sprite_size, 0))
+        return sheet
+
+    def store(self, sprite_size):
+        # One sheet on disk, the one for the current startup size replaces any other
+        if not self.cache_dir:
+            return
+        path = self.cache_path(sprite_size)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for file_name in os.listdir(self.cache_dir):
+                if file_name.startswith("atlas-") and file_name.endswith(".rgba"):
+                    os.remove(os.path.join(self.cache_dir, file_name))
+            with open(path, "wb") as cache_file:
+                cache_file.write(pygame.image.tobytes(self.sheet, "RGBA"))
+        except OSError as e:
+            print("Sprite cache not written:", e)
 
-                # Switch the turn to the opposite player
-                self.board.turn = not self.board.turn
 
-    def is_king_checked(self, color):
-        king_square = self.board.king(color)
-        return self.board.is_attacked_by(not color, king_square)
+class BoardRenderer:
+    def __init__(self, chess_game):
+        self.chess_game = chess_game
 
-    def update_display(self):
-        self.screen.fill(self.WHITE)
+        self.background = None  # Pre-composited board squares and labels
+        self.drawn_state = {}  # What is currently on screen for each square
+        self.dirty_squares = set()
+        self.state_changed = True  # Game state changed since the last draw
+        self.full_redraw = True  # Whole window needs to be repainted
+        self.exposed = []  # Areas uncovered or covered by the dialog in the current frame
+        self.overlays = {"attacks": False, "hanging": False, "pins": False}  # Toggled with A, U and P
+
+        # Frame-time counter
+        self.frame_times = deque(maxlen=240)
+        self.frames_drawn = 0
+        self.frames_idle = 0
+
+    def invalidate(self, full=False):
+        # Called on selection, moves, undo/redo and hints
+        self.state_changed = True
+        if full:
+            self.full_redraw = True
+            self.drawn_state.clear()
+
+    def toggle_overlay(self, name):
+        # Only squares whose overlay state flips are repainted
+        self.overlays[name] = not self.overlays[name]
+        self.invalidate()
+
+    def is_idle(self):
+        return not (self.state_changed or self.full_redraw or self.dirty_squares
+                    or self.chess_game.option_dialog.damage)
+
+    def square_rect(self, square):
+        # Integer edges so neighbouring squares never leave a gap between them
+        size = self.chess_game.board_size / 8
+        col = chess.square_file(square)
+        row = 7 - chess.square_rank(square)
+        left, top = int(col * size), int(row * size)
+        return pygame.Rect(left, top, int((col + 1) * size) - left, int((row + 1) * size) - top)
+
+    def build_background(self):
+        game = self.chess_game
+        self.background = pygame.Surface(game.screen.get_size()).convert()
+        self.background.fill(game.WHITE)
 
-        for row in range(8):
-            for col in range(8):
-                pygame.draw.rect(
-                    self.screen,
-                    self.BLACK if (row + col) % 2 == 0 else self.WHITE,
-                    pygame.Rect(col * self.board_size / 8, row * self.board_size / 8, self.board_size / 8,
-                                self.board_size / 8),
-                )
+        for square in chess.SQUARES:
+            row = 7 - chess.square_rank(square)
+            col = chess.square_file(square)
+            pygame.draw.rect(self.background, game.BLACK if (row + col) % 2 == 0 else game.WHITE,
+                             self.square_rect(square))
 
         # Draw file and rank indicators on the edges with customizable width and height
-        font_path = pygame.font.match_font('arial')  # You can change 'arial' to another font name
-        font = pygame.font.Font(font_path, 20)  # Adjust the font size here
-
+        label_font_size = 20  # Adjust the font size here
         label_width = 30  # Adjust the width of the labels
         label_height = 30  # Adjust the height of the labels
 
         for i in range(8):
             file_label = chr(ord('A') + i)  # Use capital letters for files
-            rank_label = str((i + 1) + (i >= 8))
+            rank_label = str(i + 1)
 
             # Draw file indicator on the bottom edge
-            file_text_surface = font.render(file_label, True, self.BLACK)
+            file_text_surface = game.text_cache.render(file_label, label_font_size, game.BLACK)
             file_text_rect = file_text_surface.get_rect(center=(
-                (i + 0.5) * self.board_size / 8, self.board_size + label_height / 2))  # Adjust the position as needed
-            file_text_rect.width = label_width  # Adjust the width of the rectangle
-            file_text_rect.height = label_height  # Adjust the height of the rectangle
-            self.screen.blit(file_text_surface, file_text_rect)
+                (i + 0.5) * game.board_size / 8, game.board_size + label_height / 2))
+            self.background.blit(file_text_surface, file_text_rect)
 
             # Draw rank indicator on the right edge
-            rank_text_surface = font.render(rank_label, True, self.BLACK)
+            rank_text_surface = game.text_cache.render(rank_label, label_font_size, game.BLACK)
             rank_text_rect = rank_text_surface.get_rect(center=(
-                self.board_size + label_width / 2,
-                (7 - i + 0.5) * self.board_size / 8))  # Adjust the position as needed
-            rank_text_rect.width = label_width  # Adjust the width of the rectangle
-            rank_text_rect.height = label_height  # Adjust the height of the rectangle
-            self.screen.blit(rank_text_surface, rank_text_rect)
+                game.board_size + label_width / 2, (7 - i + 0.5) * game.board_size / 8))
+            self.background.blit(rank_text_surface, rank_text_rect)
+
+    def collect_dirty_squares(self):
+        game = self.chess_game
+        info = game.position_info
+        pieces = info.pieces
+
+        # Overlay bitboards, empty when switched off
+        attacked = info.threats if self.overlays["attacks"] else chess.BB_EMPTY
+        hanging = info.hanging if self.overlays["hanging"] else chess.BB_EMPTY
+        pinned = info.pinned if self.overlays["pins"] else chess.BB_EMPTY
 
         for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if piece is not None:
-                piece_with_color = chess.Piece(piece.piece_type, piece.color)  # Create the full piece instance
-                piece_image = self.piece_images[piece_with_color]
-
-                piece_rect = piece_image.get_rect(
-                    center=(
-                        (chess.square_file(square) + 0.5) * self.board_size / 8,
-                        (7 - chess.square_rank(square) + 0.5) * self.board_size / 8,
-                    )
-                )
-
-                # Draw highlighting for checked king
-                if piece.piece_type == chess.KING and self.is_king_checked(piece.color):
-                    king_file = chess.square_file(square)
-                    king_rank = 7 - chess.square_rank(square)
-                    king_rect = pygame.Rect(
-                        king_file * self.board_size / 8,
-                        king_rank * self.board_size / 8,
-                        self.board_size / 8,
-                        self.board_size / 8,
-                    )
-                    pygame.draw.rect(self.screen, (255, 10, 10, 10), king_rect, border_radius=5, width=5)
-
-                # Draw highlighting for selected piece
-                if square == self.selected_piece:
-                    pygame.draw.rect(self.screen, (0, 255, 0, 100), piece_rect, border_radius=5)
-
-                self.screen.blit(piece_image, piece_rect)
-
-            # Highlight the target square (if it exists)
-            if square == self.target_square:
-                target_file = self.target_square % 8
-                target_rank = 7 - self.target_square // 8
-                target_rect = pygame.Rect(
-                    target_file * self.board_size / 8,
-                    target_rank * self.board_size / 8,
-                    self.board_size / 8,
-                    self.board_size / 8,
-                )
-                pygame.draw.rect(self.screen, (10, 10, 255, 10), target_rect, border_radius=5, width=5)
-
-        pygame.display.flip()
+            mask = chess.BB_SQUARES[square]
+            state = (pieces.get(square), square == game.selected_piece, square == game.target_square,
+                     bool(info.checked & mask), bool(attacked & mask), bool(hanging & mask), bool(pinned & mask))
+            if self.drawn_state.get(square) != state:
+                self.drawn_state[square] = state
+                self.dirty_squares.add(square)
+
+    def draw_square(self, square):
+        screen = self.chess_game.screen
+        rect = self.square_rect(square)
+        piece, selected, targeted, checked, attacked, hanging, pinned = self.drawn_state[square]
+
+        # Keep oversized sprites and outlines from bleeding into neighbouring squares
+        screen.set_clip(rect)
+        screen.blit(self.background, rect, rect)
+
+        if piece is not None:
+            piece_image = self.chess_game.piece_images[piece]
+            piece_rect = piece_image.get_rect(center=rect.center)
+
+            # Draw highlighting for checked king
+            if checked:
+                pygame.draw.rect(screen, (255, 10, 10, 10), rect, border_radius=5, width=5)
+
+            # Draw highlighting for selected piece
+            if selected:
+                pygame.draw.rect(screen, (0, 255, 0, 100), piece_rect, border_radius=5)
+
+            screen.blit(piece_image, piece_rect)
+
+            # Overlays for pieces that can be taken for free or may not move off their line
+            if hanging:
+                pygame.draw.rect(screen, (255, 140, 0), rect.inflate(-4, -4), border_radius=5, width=3)
+            if pinned:
+                pygame.draw.rect(screen, (150, 60, 200), rect.inflate(-12, -12), border_radius=5, width=3)
+
+        # Small marker on squares the opponent attacks
+        if attacked:
+            radius = max(3, rect.width // 14)
+            pygame.draw.circle(screen, (200, 30, 30), (rect.left + 2 * radius, rect.top + 2 * radius), radius)
+
+        # Highlight the target square (if it exists)
+        if targeted:
+            pygame.draw.rect(screen, (10, 10, 255, 10), rect, border_radius=5, width=5)
+
+        screen.set_clip(None)
+        return rect
+
+    def expose(self, rect):
+        # Repaint the board under a dialog that opened, moved, changed or closed
+        self.chess_game.screen.blit(self.background, rect, rect)
+        for square in chess.SQUARES:
+            if self.square_rect(square).colliderect(rect):
+                self.dirty_squares.add(square)
+        self.exposed.append(rect)
+
+    def draw(self):
+        start = time.perf_counter()
+
+        if self.background is None:
+            self.build_background()
+
+        if self.state_changed:
+            self.collect_dirty_squares()
+            self.state_changed = False
+
+        dialog = self.chess_game.option_dialog
+        damage = dialog.take_damage()
+        if not self.dirty_squares and not self.full_redraw and not damage:
+            self.frames_idle += 1
+            return
+
+        screen = self.chess_game.screen
+        self.exposed = []
+        if not self.full_redraw:
+            for rect in damage:
+                self.expose(rect)
+
+            # The dialog is translucent, a square under it is only redrawn together with the whole dialog area
+            if dialog.active and dialog.rect not in damage and any(
+                    self.square_rect(square).colliderect(dialog.rect) for square in self.dirty_squares):
+                self.expose(dialog.rect.copy())
+
+        if self.full_redraw:
+            screen.blit(self.background, (0, 0))
+        rects = self.exposed + [self.draw_square(square) for square in self.dirty_squares]
+        if dialog.active and (self.full_redraw or dialog.rect in self.exposed):
+            screen.blit(dialog.surface, dialog.rect)
+
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(rects)
+
+        self.dirty_squares.clear()
+        self.frame_times.append(time.perf_counter() - start)
+        metrics.observe("render_frame_seconds", self.frame_times[-1])
+        self.frames_drawn += 1
+
+    def frame_report(self):
+        if self.frame_times:
+            average = sum(self.frame_times) / len(self.frame_times) * 1000
+            worst = max(self.frame_times) * 1000
+        else:
+            average = worst = 0.0
+        return (f"Frames drawn : {self.frames_drawn} | Idle frames : {self.frames_idle} | "
+                f"Avg frame : {average:.2f} ms | Max frame : {worst:.2f} ms")
 
 
 class Hint:
-    def __init__(self, chess_game, info_preview):
+    # Posted to the pygame event queue when a background analysis finishes
+    HINT_EVENT = pygame.USEREVENT + 3
+
+    def __init__(self, chess_game, info_preview, engine_pool, analysis_cache=None, opening_book=None,
+                 tablebase=None):
         self.chess_game = chess_game
         self.info_preview = info_preview  # Pass the InfoPreview instance
-        self.engine = None
+        self.engine_pool = engine_pool  # Shared Stockfish processes or the built-in search engine
         self.closing_engine = False  # Flag to indicate engine closure
 
-        try:
-            # Configure the Stockfish engine
-            # Path to your Stockfish executable
-            self.engine_path = "src_files/stockfish/stockfish-windows-x86-64-avx2.exe"
-            self.engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
-            self.configure_stockfish()
-            print("[+] Stockfish Engine Activated !")
-        except FileNotFoundError as e:
-            print(f"Error: Stockfish executable not found at {self.engine_path}\n{e}")
-            self.engine = None  # Set engine to None to handle this case
-
-    def configure_stockfish(self):
-        # Set Stockfish options using UCI commands
-        self.engine.configure({"Skill Level": 10})  # Example option, adjust as needed
-
-    def get_hint(self):
-        if self.chess_game.board.is_game_over():
+        # Positions analysed before are answered from the cache when the search was deep enough
+        self.analysis_cache = analysis_cache
+        self.min_cache_depth = 12
+        self.opening_book = opening_book  # Theory moves, answered before the cache and the engine
+        self.tablebase = tablebase  # Exact endgame moves, answered before everything else
+
+        # Search budget per hint, e.g. Limit(nodes=...) keeps the built-in engine predictable on slow machines.
+        # Limit(time=2.0) when still unset once the engine is attached
+        self.limit = None
+
+        # Background analysis, requests are keyed by the FEN they were made for
+        self.requests = queue.Queue()
+        self.pending_fen = None
+        self.current_analysis = None
+        self.analysis_lock = threading.Lock()
+        # Requests made while the engine is still starting wait in the queue until this is set
+        self.engine_ready = threading.Event()
+        if self.engine_pool is not None:
+            self.attach_engine(engine_pool, analysis_cache)
+
+        self.worker = threading.Thread(target=self.analysis_worker, name="hint-analysis", daemon=True)
+        self.worker.start()
+
+    def attach_engine(self, engine_pool, analysis_cache=None):
+        # Called from the engine startup thread, engine_pool is None when the engine failed to start
+        if engine_pool is not None and self.limit is None:
+            import chess.engine  # Loaded by the engine pool already
+
+            self.limit = chess.engine.Limit(time=2.0)
+        self.engine_pool = engine_pool
+        self.analysis_cache = analysis_cache
+        self.engine_ready.set()
+
+    def cached_move(self, board):
+        if self.analysis_cache is None:
+            return None
+        entry = self.analysis_cache.get(board, self.min_cache_depth)
+        return entry.best_move if entry else None
+
+    def book_move(self, board):
+        if self.opening_book is None:
+            return None
+        with metrics.timer("book_lookup_seconds"):
+            return self.opening_book.lookup(board)
+
+    def tablebase_move(self, board):
+        if self.tablebase is None or not self.tablebase.covers(board):
+            return None
+        with metrics.timer("tablebase_probe_seconds"):
+            return self.tablebase.best_move(board)
+
+    def known_move(self, board):
+        # Tablebase and book first, then earlier analysis, the engine only searches positions none of them knows
+        return self.tablebase_move(board) or self.book_move(board) or self.cached_move(board)
+
+    @staticmethod
+    def record_metrics(requested_at, info):
+        metrics.observe("engine_request_seconds", time.perf_counter() - requested_at)
+        if "nodes" in info:
+            metrics.observe("engine_nodes", info["nodes"])
+        if "depth" in info:
+            metrics.observe("engine_depth", info["depth"])
+
+    def request_hint(self):
+        if self.chess_game.outcome is not None:
             print("Game is already over. No hints available.")
-            return None, None  # Return None values for move and target square
+            return
 
-        # Get the best move from the Stockfish engine
-        result = self.engine.analyse(self.chess_game.board, chess.engine.Limit(time=2.0))
-        best_move = result.get("pv", [])[0] if result.get("pv") else None
+        fen = self.chess_game.board.fen()
+        if fen == self.pending_fen:
+            return  # Already thinking about this position
 
+        best_move = self.known_move(self.chess_game.board)
         if best_move:
-            # Determine the target square from the move
-            target_square = best_move.to_square
-            return best_move, target_square
-        else:
-            return None, None
+            # Seen this position before, no need to wake the engine
+            self.cancel()
+            self.pending_fen = fen
+            pygame.event.post(pygame.event.Event(self.HINT_EVENT, fen=fen, move=best_move))
+            return
+
+        if self.engine_pool is None and self.engine_ready.is_set():
+            print("Stockfish engine is not available. No hints available.")
+            return
+
+        self.cancel()
+        self.pending_fen = fen
+        self.requests.put((self.chess_game.board.copy(), time.perf_counter()))
+
+    def cancel(self):
+        # Drop the pending request, e.g. when a move, undo or redo changes the position
+        self.pending_fen = None
+        with self.analysis_lock:
+            self.stop_analysis()
+
+    def stop_analysis(self):
+        # Called with analysis_lock held, an engine that crashed mid-search has nothing left to stop
+        if self.current_analysis is not None:
+            try:
+                self.current_analysis.stop()
+            except chess.engine.EngineError:
+                pass
+
+    def analysis_worker(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break  # Engine is shutting down
+            board, requested_at = request
+            self.engine_ready.wait()  # Requests made during startup are answered once the engine is up
+
+            fen = board.fen()
+            if fen != self.pending_fen:
+                continue  # Stale request, the position changed while it was queued
+            if self.engine_pool is None:
+                print("Stockfish engine is not available. No hints available.")
+                self.pending_fen = None  # Asked before the engine failed to start, let the next request report it
+                continue
+            import chess.engine
+
+            try:
+                with self.engine_pool.lease() as engine:
+                    try:
+                        with self.analysis_lock:
+                            self.current_analysis = engine.analysis(board, self.limit)
+                        self.current_analysis.wait()
+                        info = self.current_analysis.info
+                        pv = info.get("pv")
+                        self.record_metrics(requested_at, info)
+                        if self.analysis_cache is not None:
+                            self.analysis_cache.put(board, info)  # Even a cancelled search is worth keeping
+                    finally:
+                        with self.analysis_lock:
+                            self.stop_analysis()
+                            self.current_analysis = None
+            except (OSError, chess.engine.EngineError) as e:
+                print("Hint analysis failed:", e)
+                pv = None
+                if fen == self.pending_fen:
+                    self.pending_fen = None  # Let the next request for this position try again
+
+            if pv and fen == self.pending_fen:
+                pygame.event.post(pygame.event.Event(self.HINT_EVENT, fen=fen, move=pv[0]))
 
     def handle_hint(self):
+        self.request_hint()
+
+    def show_hint(self, event):
+        # Runs on the pygame thread once the worker posts a HINT_EVENT
+        if event.fen != self.pending_fen or event.fen != self.chess_game.board.fen():
+            return  # Result for a position that is no longer on the board
+        self.pending_fen = None
+
         try:
-            best_move, target_square = self.get_hint()
+            best_move = event.move
             if best_move:
                 # Highlight the suggested move and target square
                 self.chess_game.selected_piece = best_move.from_square
 
                 # Suggested Details Preview
-                self.info_preview.moveDetails(best_move.uci(),
-                                              self.chess_game.board.piece_at(self.chess_game.selected_piece),
-                                              pieceAct="Suggested")
+                self.info_preview.log_hint(best_move)
 
-                self.chess_game.target_square = target_square
+                self.chess_game.target_square = best_move.to_square
                 self.chess_game.selected_option = None  # Clear the selected_option
 
                 # Update the display
+                self.chess_game.renderer.invalidate()
                 self.chess_game.update_display()
 
                 if self.closing_engine:
@@ -569,204 +1098,170 @@ class Hint:
             print("Illegal move suggested by the engine:", e)
 
     def close_engine(self):
-        if self.engine:
-            self.closing_engine = True  # Set the flag to indicate engine closure
-            self.engine.quit()
-            print("[-] Stockfish Engine Quit !")
+        if self.worker:
+            self.cancel()
+            self.engine_ready.set()  # Let a worker waiting for the engine see the shutdown
+            self.requests.put(None)
+            self.worker.join(timeout=5)
+            self.worker = None
+        self.closing_engine = True  # Set the flag to indicate engine closure
 
 
 class OptionDialog:
-    def __init__(self):
+    # Modal overlay drawn on the game window, answered from the same event loop as the board
+    WIDTH = 300
+    BACKGROUND = (46, 46, 46, 230)
+    BUTTON = (0, 122, 204)
+    BUTTON_HOVER = (0, 89, 153)  # Darker color on hover
+    CLOSE = (251, 100, 0)
+
+    def __init__(self, chess_game):
+        self.chess_game = chess_game
         self.response = None
-        self.dialog = None  # Initialize dialog attribute
+        self.active = False
+        self.callback = None
+
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.surface = None
+        self.buttons = []  # (option, rect relative to the dialog)
+        self.close_rect = None
+        self.hovered = None
 
         self.dragging = False
-        self.start_x = 0
-        self.start_y = 0
+        self.drag_offset = (0, 0)
+        self.damage = []  # Screen areas the renderer has to repaint
+
+    def display_message_with_options(self, message, descr, options, callback=None):
+        # Returns at once, the choice is passed to callback when a button is clicked
+        self.message = message
+        self.descr = descr
+        self.options = list(options)
+        self.callback = callback
+        self.response = None
+        self.hovered = None
+        self.dragging = False
+
+        # Title, description and one row per option
+        height = 110 + len(self.options) * 46
+        self.buttons = [(option, pygame.Rect((self.WIDTH - 140) // 2, 100 + index * 46, 140, 36))
+                        for index, option in enumerate(self.options)]
+        self.close_rect = pygame.Rect(self.WIDTH - 40, 10, 30, 30)
+
+        screen_rect = self.chess_game.screen.get_rect()
+        self.rect = pygame.Rect(0, 0, self.WIDTH, height)
+        self.rect.center = screen_rect.center
+        self.rect.clamp_ip(screen_rect)
+
+        self.active = True
+        self.render()
+        self.damage.append(self.rect.copy())
+
+    def render(self):
+        text_cache = self.chess_game.text_cache
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.surface.fill(self.BACKGROUND)
+
+        title = text_cache.render(self.message, 26, (255, 255, 255))
+        self.surface.blit(title, title.get_rect(center=(self.WIDTH // 2, 34)))
+        descr = text_cache.render(self.descr, 14, (192, 192, 192))
+        self.surface.blit(descr, descr.get_rect(center=(self.WIDTH // 2, 72)))
+
+        close = text_cache.render("X", 20, self.CLOSE)
+        self.surface.blit(close, close.get_rect(center=self.close_rect.center))
+
+        for option, button_rect in self.buttons:
+            color = self.BUTTON_HOVER if option == self.hovered else self.BUTTON
+            pygame.draw.rect(self.surface, color, button_rect)
+            label = text_cache.render(option, 18, (255, 255, 255))
+            self.surface.blit(label, label.get_rect(center=button_rect.center))
+
+    def option_at(self, pos):
+        x, y = pos[0] - self.rect.x, pos[1] - self.rect.y
+        if self.close_rect.collidepoint(x, y):
+            return "Cancel"
+        for option, button_rect in self.buttons:
+            if button_rect.collidepoint(x, y):
+                return option
+        return None
 
     def option_clicked(self, option):
         self.response = option
-        self.dialog.destroy()
-
-    def on_mouse_press(self, event):
-        self.dragging = True
-        self.start_x = event.x
-        self.start_y = event.y
-
-    def on_mouse_release(self, _event):
+        self.active = False
         self.dragging = False
+        self.damage.append(self.rect.copy())
+
+        callback, self.callback = self.callback, None
+        if callback:
+            callback(option)
+
+    def handle_event(self, event):
+        # Returns True when the dialog used the event, the board never sees it then
+        if not self.active:
+            return False
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.rect.collidepoint(event.pos):
+                option = self.option_at(event.pos)
+                if option:
+                    self.option_clicked(option)
+                else:
+                    self.dragging = True
+                    self.drag_offset = (event.pos[0] - self.rect.x, event.pos[1] - self.rect.y)
+            return True
 
-    def on_mouse_motion(self, event):
-        if self.dragging:
-            x = self.dialog.winfo_x() + (event.x - self.start_x)
-            y = self.dialog.winfo_y() + (event.y - self.start_y)
-            self.dialog.geometry(f"+{x}+{y}")
-
-    def buttonDesign(self, text, command):
-        button = tk.Button(
-            self.dialog,
-            text=text,
-            command=command,
-            padx=10,
-            pady=6,
-            width=10,
-            height=1,
-            fg="white",
-            bg="#007ACC",  # Background color
-            relief="flat",  # Flat border
-            font=("Arial", 10, "bold"),  # Custom font
-        )
-
-        button.bind("<Enter>", lambda event, b=button: self.on_button_hover(b, True))
-        button.bind("<Leave>", lambda event, b=button: self.on_button_hover(b, False))
-
-        return button
-
-    @staticmethod
-    def on_button_hover(button, is_hovering):
-        if is_hovering:
-            button.config(bg="#005999")  # Darker color on hover
-        else:
-            button.config(bg="#007ACC")  # Original color on leave
-
-    def display_message_with_options(self, message, descr, options):
-        root = tk.Tk()
-        root.withdraw()  # Hide the main Tkinter window
-
-        self.dialog = tk.Toplevel(root)  # Create and assign the dialog attribute
-        self.dialog.overrideredirect(True)  # Remove decorations, including title bar
-        self.dialog.geometry("350x320+800+500")
-
-        # Set a dark background color (you can change the color code as needed)
-        self.dialog.configure(bg="#2E2E2E")
-
-        # Set transparency (0 = fully transparent, 1 = fully opaque)
-        self.dialog.attributes("-alpha", 0.9)  # Adjust the value for the desired level of transparency
-
-        # Close button
-        close_button = tk.Button(self.dialog, text="X", command=lambda: self.option_clicked("Cancel"), bg="#2E2E2E",
-                                 fg="#FB6400", width=3, height=2, bd=0, activebackground='red')
-        close_button.place(x=self.dialog.winfo_reqwidth() + 110, y=10)  # Adjust the position as needed
-
-        lbl_1 = tk.Label(self.dialog, text=message, font=(None, 20), bg="#2E2E2E", fg="white")
-        lbl_1.pack(pady=10)
-
-        lbl_2 = tk.Label(self.dialog, text=descr, font=(None, 8), bg="#2E2E2E", fg="silver")
-        lbl_2.pack(pady=10)
-
-        for option in options:
-            button = self.buttonDesign(option, lambda opt=option: self.option_clicked(opt))
-            button.pack(pady=5)
-
-        # Bind mouse events for moving the dialog
-        self.dialog.bind("<ButtonPress-1>", self.on_mouse_press)
-        self.dialog.bind("<ButtonRelease-1>", self.on_mouse_release)
-        self.dialog.bind("<B1-Motion>", self.on_mouse_motion)
-
-        self.dialog.wait_window(self.dialog)
-
-        return self.response
-
-
-class InfoPreview:
-    def __init__(self, chess_game):
-        self.chessGame = chess_game
-        self.count = 0
-
-    @staticmethod
-    def AtNow():
-        return datetime.datetime.now().strftime("%H:%M:%S")
+        if event.type == pygame.MOUSEBUTTONUP:
+            self.dragging = False
+            return True
 
-    @staticmethod
-    def TimeNow():
-        return datetime.datetime.now()
+        if event.type == pygame.MOUSEMOTION:
+            if self.dragging:
+                self.on_mouse_motion(event)
+            else:
+                self.on_button_hover(self.option_at(event.pos) if self.rect.collidepoint(event.pos) else None)
+            return True
 
-    @staticmethod
-    def pieceFind(pieceFig):
-        if pieceFig.piece_type == chess.PAWN:
-            pieceType = "Pawn"
-        elif pieceFig.piece_type == chess.KING:
-            pieceType = "King"
-        elif pieceFig.piece_type == chess.QUEEN:
-            pieceType = "Queen"
-        elif pieceFig.piece_type == chess.ROOK:
-            pieceType = "Rook"
-        elif pieceFig.piece_type == chess.BISHOP:
-            pieceType = "Bishop"
-        else:
-            pieceType = "Knight"
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.option_clicked("Cancel")
+            return True
 
-        if pieceFig.color:
-            pieceColor = "White"
-        else:
-            pieceColor = "Black"
+        return False
 
-        return f"{pieceColor} {pieceType}"
+    def on_mouse_motion(self, event):
+        old_rect = self.rect.copy()
+        self.rect.topleft = (event.pos[0] - self.drag_offset[0], event.pos[1] - self.drag_offset[1])
+        self.rect.clamp_ip(self.chess_game.screen.get_rect())
+        if self.rect != old_rect:
+            self.damage.extend((old_rect, self.rect.copy()))
 
-    def moveDetails(self, moveAt, pieceFigure=None, pieceAct=None):
-        PieceAction = pieceAct
+    def on_button_hover(self, option):
+        if option != self.hovered and option != "Cancel":
+            self.hovered = option
+            self.render()
+            self.damage.append(self.rect.copy())
 
-        moving = re.findall(r'[a-zA-Z]+\d+', str(moveAt))
+    def take_damage(self):
+        damage, self.damage = self.damage, []
+        return damage
 
-        if pieceFigure is not None:
-            self.count += 1
-            movedPiece = self.pieceFind(pieceFigure)
-            if PieceAction is None:
-                print(f"{str(self.count).ljust(4)} [{self.AtNow()}] {movedPiece} Moved from {moving[0]} to {moving[1]}")
-            elif PieceAction == "Suggested":
-                print(f"     [{self.AtNow()}] Suggested: {movedPiece} Move from {moving[0]} to {moving[1]}")
-            elif PieceAction == "Castle":
-                print(f"{str(self.count).ljust(4)} [{self.AtNow()}] {movedPiece} Move from {moving[0]} to {moving[1]}"
-                      f" & Castled")
-            else:
-                print(f"{str(self.count).ljust(4)} [{self.AtNow()}] {movedPiece} Moved from {moving[0]} to {moving[1]}"
-                      f" & Got a Promotion as a {self.pieceFind(PieceAction)}")
-
-        elif PieceAction == "undone":
-            self.count -= 1
-            print(f"[{self.AtNow()}] Undo Moved from {moving[1]} to {moving[0]}")
-        elif PieceAction == "redone":
-            self.count += 1
-            print(f"[{self.AtNow()}] Redo Moved from {moving[0]} to {moving[1]}")
-        else:
-            pass
 
-    def capturedDetector(self, move):
-        # Detect if a piece is captured
-        captured_piece = self.chessGame.board.piece_at(move.to_square)
-        if captured_piece:
-            print(f"     [{self.AtNow()}] "
-                  f"{self.pieceFind(self.chessGame.board.piece_at(self.chessGame.selected_piece))} "
-                  f" captures {self.pieceFind(self.chessGame.board.piece_at(move.to_square))}")
-
-        elif self.chessGame.board.is_en_passant(move):
-            captured_pawn = "White" if self.chessGame.board.turn == chess.BLACK else "Black"
-            print(f"     [{self.AtNow()}] Pawn En Passant [{captured_pawn} Pawn Captured]")
-        else:
-            pass
-
-    def StateArrange(self, position, player=None):
-        if position == "Abandoned":
-            print(f"👉   [{self.AtNow()}] Game {position}")
-        elif position == "Drawn":
-            print(f"👉   [{self.AtNow()}] Match {position} - Fivefold Repetition")
-        elif position == "ins_met":
-            print(f"👉   [{self.AtNow()}] Insufficient Material - Match Drawn !")
-        elif position == "fifty_moves":
-            print(f"👉   [{self.AtNow()}] Fifty Moves - Match Drawn !")
-        elif position == "Check Mate":
-            print(f"👉   [{self.AtNow()}] {position} & {player} Player Won the Game")
-        elif position == "Stalemate":
-            print(f"👉   [{self.AtNow()}] {position} !")
-        elif position == "resign":
-            print(f"👉   [{self.AtNow()}] {player} Player Resigned")
-        else:
-            pass
-        print(f"👉   Total Steps : {self.count}")
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="Chess Game")
+    parser.add_argument("--pgn", help="PGN file to step through, Page Up / Page Down switch games")
+    parser.add_argument("--game", type=int, default=1, help="Game number to open first")
+    parser.add_argument("--log-jsonl", help="Append every move log record to this JSONL file")
+    parser.add_argument("--log-pgn", help="Append every played game to this PGN file")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     game = ChessGame()
+    if args.log_jsonl:
+        game.move_log.add_sink(JsonlSink(args.log_jsonl))
+    if args.log_pgn:
+        game.move_log.add_sink(PgnSink(args.log_pgn))
+    if args.pgn:
+        game.open_database(args.pgn, args.game - 1)
     print(f"| {game.info_preview.TimeNow()} |")
     start = game.info_preview.TimeNow()
     print(f"[{start.time()}] Game Start")
@@ -776,3 +1271,10 @@ if __name__ == "__main__":
 
     due = stop - start
     print(f"Total Time : {due}")
+    print(game.renderer.frame_report())
+    print(startup.report())
+
+    # Where the session spent its time
+    print(metrics.report())
+    metrics.dump("game_metrics.json")
+    metrics.dump("game_metrics.prom")
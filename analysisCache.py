@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+import chess
+import chess.engine
+import chess.polyglot
+
+
+# Score is kept from White's point of view so one entry serves both sides
+AnalysisEntry = namedtuple("AnalysisEntry", ["best_move", "pv", "score", "depth"])
+
+
+class AnalysisCache:
+    def __init__(self, max_entries=4096, path=None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # Zobrist hash -> AnalysisEntry, oldest first
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        # Optional on-disk store, one small row per position
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS analysis ("
+                            "key INTEGER PRIMARY KEY, depth INTEGER, cp INTEGER, mate INTEGER, pv TEXT)")
+            self.db.commit()
+
+    @staticmethod
+    def key(board):
+        # Transpositions share a key, move counters are not part of the hash
+        return chess.polyglot.zobrist_hash(board)
+
+    @staticmethod
+    def db_key(key):
+        # SQLite integers are signed 64-bit
+        return key - (1 << 64) if key >= (1 << 63) else key
+
+    def get(self, board, min_depth=0):
+        key = self.key(board)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            elif self.db is not None:
+                entry = self.load(key)
+                if entry is not None:
+                    self.remember(key, entry)
+
+        # Also guards against the rare hash collision
+        if entry is None or entry.depth < min_depth or entry.best_move not in board.legal_moves:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def put(self, board, info):
+        pv = info.get("pv")
+        if not pv:
+            return None
+
+        score = info.get("score")
+        entry = AnalysisEntry(pv[0], list(pv), score.white() if score is not None else None, info.get("depth", 0))
+        key = self.key(board)
+
+        with self.lock:
+            current = self.entries.get(key)
+            if current is not None and current.depth > entry.depth:
+                return current  # Keep the deeper result
+            self.remember(key, entry)
+            if self.db is not None:
+                self.store(key, entry)
+        return entry
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def load(self, key):
+        row = self.db.execute("SELECT depth, cp, mate, pv FROM analysis WHERE key = ?",
+                              (self.db_key(key),)).fetchone()
+        if row is None:
+            return None
+
+        depth, cp, mate, pv = row
+        moves = [chess.Move.from_uci(uci) for uci in pv.split()]
+        if mate is not None:
+            score = chess.engine.Mate(mate)
+        elif cp is not None:
+            score = chess.engine.Cp(cp)
+        else:
+            score = None
+        return AnalysisEntry(moves[0], moves, score, depth)
+
+    def store(self, key, entry):
+        cp = entry.score.score() if entry.score is not None else None
+        mate = entry.score.mate() if entry.score is not None else None
+        self.db.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?)",
+                        (self.db_key(key), entry.depth, cp, mate, " ".join(move.uci() for move in entry.pv)))
+        self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            with self.lock:
+                self.db.close()
+                self.db = None
@@ -0,0 +1,238 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import chess
+import chess.engine
+import chess.polyglot
+from enginePool import EnginePool
+from engineLocator import EngineLocator
+from selfPlay import parse_options
+
+
+def parse_position(line):
+    # FEN when the last two fields are the move counters, EPD with operations otherwise
+    parts = line.split()
+    if len(parts) >= 6 and parts[4].isdigit() and parts[5].isdigit():
+        return chess.Board(" ".join(parts[:6])), None
+    board = chess.Board()
+    operations = board.set_epd(line)
+    position_id = operations.get("id")
+    return board, str(position_id) if position_id is not None else None
+
+
+def read_positions(path):
+    # One position per line, '-' reads standard input, the file is never loaded as a whole
+    file = sys.stdin if path == "-" else open(path)
+    try:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                yield parse_position(line)
+            except ValueError as e:
+                print(f"[-] Line {number} skipped : {e}", file=sys.stderr)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def analyse_position(pool, board, key, position_id, limit):
+    row = {"key": key, "id": position_id, "fen": board.fen(),
+           "best_move": None, "pv": "", "score_cp": None, "score_mate": None, "depth": 0, "nodes": 0, "time": 0.0}
+
+    if board.is_game_over():
+        return row  # Nothing to search
+
+    with pool.lease() as engine:
+        info = engine.analyse(board, limit)
+
+    # Scores from White's point of view, like analysisCache
+    score = info.get("score")
+    pv = info.get("pv") or []
+    row.update({
+        "best_move": pv[0].uci() if pv else None,
+        "pv": " ".join(move.uci() for move in pv),
+        "score_cp": score.white().score() if score is not None else None,
+        "score_mate": score.white().mate() if score is not None else None,
+        "depth": info.get("depth", 0),
+        "nodes": info.get("nodes", 0),
+        "time": info.get("time", 0.0),
+    })
+    return row
+
+
+class JsonlWriter:
+    # The output is its own checkpoint, every complete line is a finished position
+    def __init__(self, path, resume):
+        self.path = path
+        self.done = self.load_done() if resume else set()
+        self.file = open(path, "a" if resume else "w")
+
+    def load_done(self):
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+
+        good_size = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                try:
+                    done.add(json.loads(line)["key"])
+                except (ValueError, KeyError):
+                    break  # Cut off by an interrupted run
+                good_size += len(line)
+
+        with open(self.path, "r+b") as file:
+            file.truncate(good_size)
+        return done
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    # A directory of part files, one per flushed batch, readable as one pyarrow dataset
+    def __init__(self, path, resume):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow, 'pip install pyarrow', or use --format jsonl")
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.schema = pyarrow.schema([
+            ("key", pyarrow.string()), ("id", pyarrow.string()), ("fen", pyarrow.string()),
+            ("best_move", pyarrow.string()), ("pv", pyarrow.string()), ("score_cp", pyarrow.int32()),
+            ("score_mate", pyarrow.int32()), ("depth", pyarrow.int32()), ("nodes", pyarrow.int64()),
+            ("time", pyarrow.float64()),
+        ])
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+        if not resume:
+            for part in parts:
+                os.remove(part)
+            parts = []
+
+        self.done = set()
+        for part in parts:
+            try:
+                self.done.update(self.parquet.read_table(part, columns=["key"]).column("key").to_pylist())
+            except (OSError, self.pyarrow.ArrowException):
+                os.remove(part)  # Written by an interrupted run
+        self.part = max((int(os.path.basename(part)[5:10]) + 1 for part in parts), default=0)
+
+    def write(self, rows):
+        if not rows:
+            return
+        table = self.pyarrow.Table.from_pylist(rows, schema=self.schema)
+        path = os.path.join(self.path, f"part-{self.part:05d}.parquet")
+        self.parquet.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)  # A part file is either complete or missing
+        self.part += 1
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse every position of an EPD or FEN file")
+    parser.add_argument("input", help="EPD/FEN file, one position per line, '-' for standard input")
+    parser.add_argument("--output", default="analysis.jsonl", help="JSONL file or Parquet directory")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default=None, help="Default from --output")
+    parser.add_argument("--engine", default=None, help="UCI binary, found or built by EngineLocator if omitted")
+    parser.add_argument("--workers", type=int, default=4, help="Engine processes analysing in parallel")
+    parser.add_argument("--time", type=float, default=None, help="Seconds per position")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--hash", type=int, default=16)
+    parser.add_argument("--option", action="append", default=[], help="Extra UCI option, e.g. 'Contempt=0'")
+    parser.add_argument("--batch", type=int, default=100, help="Results written per flush")
+    parser.add_argument("--resume", action="store_true", help="Skip positions already in the output")
+    parser.add_argument("--report", type=float, default=5.0, help="Seconds between throughput lines")
+    args = parser.parse_args()
+
+    limit = chess.engine.Limit(time=args.time, depth=args.depth, nodes=args.nodes)
+    if args.time is None and args.depth is None and args.nodes is None:
+        limit = chess.engine.Limit(depth=12)
+
+    options = parse_options(args.option)
+    if args.engine is None:
+        args.engine, engine_options = EngineLocator().locate()
+        options = {**engine_options, **options}
+
+    output_format = args.format or ("jsonl" if args.output.endswith(".jsonl") else "parquet")
+    if output_format == "jsonl":
+        writer = JsonlWriter(args.output, args.resume)
+    else:
+        writer = ParquetWriter(args.output, args.resume)
+    pool = EnginePool.open(args.engine, size=args.workers, threads=args.threads, hash_size=args.hash,
+                           options=options, fallback=True)
+
+    seen = set(writer.done)  # Zobrist keys, finished in an earlier run or already queued in this one
+    resumed = len(seen)
+    analysed = duplicates = 0
+    batch = []
+    start = last_report = time.perf_counter()
+    print(f"👉   Analysing {args.input} on {args.workers} engines ({limit}), {resumed} positions already done")
+
+    def collect(finished):
+        nonlocal analysed
+        for future in finished:
+            try:
+                batch.append(future.result())
+                analysed += 1
+            except chess.engine.EngineError as e:
+                print(f"[-] Position skipped, the engine failed : {e}", file=sys.stderr)  # Retried by --resume
+        if len(batch) >= args.batch:
+            writer.write(batch)
+            batch.clear()
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            pending = set()
+            for board, position_id in read_positions(args.input):
+                key = f"{chess.polyglot.zobrist_hash(board):016x}"
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+
+                # Bounded queue, a huge input file does not turn into a huge backlog of futures
+                if len(pending) >= args.workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending.add(executor.submit(analyse_position, pool, board, key, position_id, limit))
+
+                now = time.perf_counter()
+                if now - last_report >= args.report:
+                    last_report = now
+                    print(f"{str(analysed).ljust(8)} positions, {analysed / (now - start):.1f} pos/s, "
+                          f"{duplicates} duplicates skipped")
+
+            finished, _ = wait(pending)
+            collect(finished)
+    finally:
+        writer.write(batch)
+        writer.close()
+        pool.close()
+
+    wall = time.perf_counter() - start
+    print(f"👉   {analysed} positions in {wall:.2f} s ({analysed / wall if wall else 0:.1f} pos/s), "
+          f"{duplicates} duplicates, {resumed} resumed, Output : {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import os
+import chess
+import chess.syzygy
+
+
+class EndgameTablebase:
+    def __init__(self, directory, max_open=64):
+        self.directory = directory
+
+        # Tables are opened and memory-mapped on first probe, at most max_open file handles stay open (LRU)
+        self.tablebase = chess.syzygy.Tablebase(max_fds=max_open)
+        self.tables = self.tablebase.add_directory(directory)
+
+        # Largest table present, e.g. KRPvKR is 5 pieces
+        names = set(self.tablebase.wdl) | set(self.tablebase.dtz)
+        self.max_pieces = max((len(name) - 1 for name in names), default=0)
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, directory, **kwargs):
+        # Open Syzygy tables, or return None when there are none
+        if not directory or not os.path.isdir(directory):
+            return None
+        tablebase = cls(directory, **kwargs)
+        if not tablebase.tables:
+            tablebase.close()
+            return None
+
+        print(f"[+] Syzygy Tablebase Loaded ! ({tablebase.tables} tables, up to {tablebase.max_pieces} pieces)")
+        return tablebase
+
+    def covers(self, board):
+        # Cheap test before touching any table, tables hold no castling rights
+        return chess.popcount(board.occupied) <= self.max_pieces and not board.castling_rights
+
+    def probe_wdl(self, board):
+        # 2 win, 1 win spoiled by the fifty-move rule, 0 draw, -1 and -2 the same for losses, None if unknown
+        if not self.covers(board):
+            return None
+        wdl = self.tablebase.get_wdl(board)
+        if wdl is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return wdl
+
+    def best_move(self, board):
+        # DTZ-optimal move, win fastest towards a zeroing move and lose as slowly as possible
+        if not self.covers(board) or self.tablebase.get_wdl(board) is None:
+            return None
+
+        best_key = None
+        best_move = None
+        for move in board.legal_moves:
+            zeroing = board.is_zeroing(move)
+            board.push(move)
+            try:
+                if board.is_checkmate():
+                    key = (3, 0)  # Mate now beats any table result
+                else:
+                    wdl = self.tablebase.get_wdl(board)
+                    dtz = self.tablebase.get_dtz(board)
+                    if wdl is None or dtz is None:
+                        continue
+                    wdl = -wdl
+                    distance = 1 if zeroing else abs(dtz) + 1
+                    key = (wdl, -distance if wdl > 0 else distance)
+            finally:
+                board.pop()
+
+            if best_key is None or key > best_key:
+                best_key = key
+                best_move = move
+
+        if best_move is not None:
+            self.hits += 1
+        return best_move
+
+    def engine_options(self):
+        # Lets Stockfish probe the same tables during its own search
+        return {"SyzygyPath": self.directory}
+
+    def close(self):
+        self.tablebase.close()
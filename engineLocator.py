@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class EngineLocator:
+    # Finds a UCI binary for EnginePool, or builds the bundled Stockfish source for this CPU once
+    BUNDLED_BINARY = os.path.join(HERE, "src_files", "stockfish", "stockfish-windows-x86-64-avx2.exe")
+
+    def __init__(self, source_dir=None, cache_dir=None, config_path=None):
+        self.source_dir = source_dir or os.path.join(HERE, "src_files", "stockfish", "src")
+        self.cache_dir = cache_dir or os.path.join(HERE, "src_files", "engine_cache")
+        self.config_path = config_path or os.path.join(HERE, "src_files", "engine.json")
+
+    def locate(self, build=True):
+        # Returns (path, options), options holds what the binary needs on top of the caller's own
+        configured = self.configured_path()
+        if configured and not self.is_executable(configured):
+            # Asked for explicitly, say so before looking elsewhere or starting a build
+            problem = "not executable" if os.path.isfile(configured) else "not found"
+            print(f"Error: Configured Stockfish {configured} ({self.configured_source()}) is {problem}, "
+                  f"looking for another engine")
+
+        for path in (configured, self.BUNDLED_BINARY if os.name == "nt" else None, shutil.which("stockfish")):
+            if path and self.is_executable(path):
+                return path, {}
+
+        if not os.path.isdir(self.source_dir):
+            return None, {}
+
+        arch = self.detect_arch()
+        key = self.source_key()
+        for classical in (False, True):
+            path = self.build_path(arch, key, classical)
+            if os.path.isfile(path):
+                return path, self.build_options(classical)
+
+        if not build:
+            return None, {}
+        return self.build(arch, key)
+
+    @staticmethod
+    def is_executable(path):
+        return os.path.isfile(path) and os.access(path, os.X_OK)
+
+    def configured_source(self):
+        return "STOCKFISH_PATH" if os.environ.get("STOCKFISH_PATH") else self.config_path
+
+    def configured_path(self):
+        # STOCKFISH_PATH wins over src_files/engine.json, e.g. {"path": "/usr/games/stockfish"}
+        if os.environ.get("STOCKFISH_PATH"):
+            return os.environ["STOCKFISH_PATH"]
+        try:
+            with open(self.config_path) as file:
+                return json.load(file).get("path")
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def cpu_flags():
+        if platform.system() == "Linux":
+            try:
+                with open("/proc/cpuinfo") as file:
+                    for line in file:
+                        if line.startswith("flags"):
+                            return set(line.split(":", 1)[1].split())
+            except OSError:
+                pass
+        elif platform.system() == "Darwin":
+            try:
+                output = subprocess.run(["sysctl", "-n", "machdep.cpu.features", "machdep.cpu.leaf7_features"],
+                                        capture_output=True, text=True).stdout
+                return {flag.lower().replace(".", "_") for flag in output.split()}
+            except OSError:
+                pass
+        return set()
+
+    @classmethod
+    def detect_arch(cls):
+        # Most specific Makefile ARCH the host supports, see 'make help' in the Stockfish source
+        machine = platform.machine().lower()
+        if machine in ("arm64", "aarch64"):
+            return "apple-silicon" if platform.system() == "Darwin" else "armv8"
+        if machine not in ("x86_64", "amd64"):
+            return "general-64" if platform.architecture()[0] == "64bit" else "general-32"
+
+        flags = cls.cpu_flags()
+        if {"avx2", "bmi2"} <= flags:
+            return "x86-64-bmi2"
+        if "avx2" in flags:
+            return "x86-64-avx2"
+        if {"popcnt", "sse4_1"} <= flags or {"popcnt", "sse4_2"} <= flags:
+            return "x86-64-sse41-popcnt"
+        return "x86-64"
+
+    def source_key(self):
+        # Content hash of the sources, a changed file means a new build
+        digest = hashlib.sha1()
+        for root, dirs, files in os.walk(self.source_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith((".o", ".nnue", ".gcda", ".gcno")) or name in ("stockfish", "stockfish.exe"):
+                    continue  # Build output
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, self.source_dir).encode())
+                with open(path, "rb") as file:
+                    digest.update(file.read())
+        return digest.hexdigest()[:12]
+
+    def build_path(self, arch, key, classical):
+        name = f"stockfish-{arch}-{key}{'-classical' if classical else ''}"
+        return os.path.join(self.cache_dir, name + (".exe" if os.name == "nt" else ""))
+
+    @staticmethod
+    def build_options(classical):
+        # A build without the embedded net has to be told to use the classical evaluation
+        return {"Use NNUE": False} if classical else {}
+
+    def build(self, arch, key):
+        if not shutil.which("make") or not (shutil.which("g++") or shutil.which("clang++")):
+            print("Error: Stockfish source found but make or a C++ compiler is missing, not building")
+            return None, {}
+
+        print(f"👉   Building Stockfish for {arch}, only needed once per source version")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.cache_dir) as work_dir:
+            # Build in a copy so the bundled source tree stays clean
+            src = os.path.join(work_dir, "src")
+            shutil.copytree(self.source_dir, src)
+            jobs = str(os.cpu_count() or 1)
+
+            # The net is downloaded by the Makefile, without it the build falls back to the classical evaluation
+            subprocess.run(["make", "net"], cwd=src, capture_output=True)
+            classical = not any(name.endswith(".nnue") and os.path.getsize(os.path.join(src, name))
+                                for name in os.listdir(src))
+            command = ["make", "-j", jobs, "build", f"ARCH={arch}"]
+            if classical:
+                command.append("EXTRACXXFLAGS=-DNNUE_EMBEDDING_OFF")
+
+            result = subprocess.run(command, cwd=src, capture_output=True, text=True)
+            binary = os.path.join(src, "stockfish.exe" if os.name == "nt" else "stockfish")
+            if result.returncode != 0 or not os.path.isfile(binary):
+                print(f"Error: Stockfish build failed\n{result.stderr[-2000:]}")
+                return None, {}
+
+            path = self.build_path(arch, key, classical)
+            os.replace(binary, path)  # Atomic, a concurrent startup sees either nothing or the full binary
+
+        print(f"[+] Stockfish built : {path}{' (classical evaluation, no NNUE net)' if classical else ''}")
+        return path, self.build_options(classical)
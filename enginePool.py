@@ -0,0 +1,132 @@
+import queue
+import threading
+from contextlib import contextmanager
+import chess
+import chess.engine
+from searchEngine import SearchEngine
+
+
+class EnginePool:
+    def __init__(self, engine_path, size=1, threads=1, hash_size=16, options=None):
+        self.engine_path = engine_path  # None runs the built-in SearchEngine instead of a UCI binary
+        self.size = size  # Number of warm UCI processes kept for the whole session
+
+        # Options sent to every engine, unknown ones are skipped per engine
+        self.options = {"Threads": threads, "Hash": hash_size}
+        self.options.update(options or {})
+
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.engines = []
+        self.closed = False
+
+    @classmethod
+    def open(cls, engine_path, fallback=False, **kwargs):
+        # Start a pool, or return None when the engine binary is missing or broken and there is no fallback
+        if engine_path is not None:
+            pool = cls(engine_path, **kwargs)
+            try:
+                pool.start()
+                print(f"[+] Stockfish Engine Pool Activated ! ({pool.size} x {pool.options})")
+                return pool
+            except FileNotFoundError as e:
+                print(f"Error: Stockfish executable not found at {engine_path}\n{e}")
+                pool.close()
+            except (OSError, chess.engine.EngineError) as e:
+                # Present but not runnable, e.g. no permission, wrong architecture or not a UCI engine
+                print(f"Error: Stockfish at {engine_path} failed to start\n{e}")
+                pool.close()
+
+        if not fallback:
+            return None
+        pool = cls(None, **kwargs)
+        pool.start()
+        print(f"[+] Built-in Search Engine Activated ! ({pool.size} x {pool.options})")
+        return pool
+
+    def start(self):
+        for _ in range(self.size):
+            self.idle.put(self.start_engine())
+
+    def start_engine(self):
+        if self.engine_path is None:
+            engine = SearchEngine()
+        else:
+            engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+        engine.configure({name: value for name, value in self.options.items() if name in engine.options})
+
+        with self.lock:
+            self.engines.append(engine)
+        return engine
+
+    @staticmethod
+    def is_alive(engine):
+        if isinstance(engine, SearchEngine):
+            return True  # Runs in this process, nothing to crash separately
+        return not engine.protocol.returncode.done()
+
+    def restart(self, engine):
+        # engine is None for a slot whose earlier restart failed
+        if engine is not None:
+            print("[!] Stockfish Engine crashed, restarting")
+            self.discard(engine)
+        try:
+            return self.start_engine()
+        except (OSError, chess.engine.EngineError) as e:
+            print(f"Error: Stockfish Engine could not be restarted\n{e}")
+            return None
+
+    def discard(self, engine):
+        with self.lock:
+            if engine in self.engines:
+                self.engines.remove(engine)
+        try:
+            engine.quit()
+        except chess.engine.EngineError:
+            pass  # Already gone
+
+    @contextmanager
+    def lease(self, timeout=None):
+        # Hand out one engine exclusively until the with-block ends
+        if self.closed:
+            raise chess.engine.EngineError("Engine pool is closed")
+
+        try:
+            engine = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise chess.engine.EngineError("No engine available in the pool") from None
+
+        if engine is None or not self.is_alive(engine):
+            engine = self.restart(engine)
+            if engine is None:
+                self.release(None)  # Keep the slot, the next lease tries to start the engine again
+                raise chess.engine.EngineError("No engine available in the pool")
+
+        try:
+            yield engine
+        except chess.engine.EngineTerminatedError:
+            engine = self.restart(engine)
+            raise
+        finally:
+            self.release(engine)
+
+    def release(self, engine):
+        # None marks a slot whose engine could not be restarted, lease retries it instead of waiting forever
+        if self.closed:
+            if engine is not None:
+                self.discard(engine)
+        else:
+            self.idle.put(engine)
+
+    def close(self):
+        self.closed = True
+        running = bool(self.engines)
+        while True:
+            try:
+                engine = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if engine is not None:
+                self.discard(engine)
+        if running:
+            print("[-] Stockfish Engine Pool Closed !")
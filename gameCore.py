@@ -0,0 +1,363 @@
+import datetime
+from collections import OrderedDict, namedtuple
+import chess
+from gameMetrics import metrics
+from moveLog import LogEvent
+
+
+# Promotion dialog choices
+PROMOTION_PIECES = {"Queen": chess.QUEEN, "Rook": chess.ROOK, "Bishop": chess.BISHOP, "Knight": chess.KNIGHT}
+
+
+MoveRecord = namedtuple("MoveRecord", ["move", "piece", "captured"])
+
+
+class MoveHistory:
+    def __init__(self, board):
+        self.board = board
+        self.records = []  # Played moves, parallel to board.move_stack
+        self.redo_line = []  # Undone moves, the next one to redo is last
+        # Moves leading to a position -> (redo line, its deeper branches) abandoned by playing a different move there.
+        # Keyed by the whole path, the same ply reached by other moves has its own branches
+        self.branches = {}
+
+    def path(self):
+        return tuple(self.board.move_stack)
+
+    def take_deeper_branches(self):
+        # Branches further down the current redo line, stored with that line while it is not the one being redone
+        path = self.path()
+        deeper = {key: lines for key, lines in self.branches.items()
+                  if len(key) > len(path) and key[:len(path)] == path}
+        for key in deeper:
+            del self.branches[key]
+        return deeper
+
+    def push(self, move):
+        record = MoveRecord(move, self.board.piece_at(move.from_square), self.board.piece_at(move.to_square))
+
+        if self.redo_line:
+            if self.redo_line[-1].move == move:
+                self.redo_line.pop()  # Same as redoing, the rest of the line stays redoable
+            else:
+                # Keep the old continuation as a branch instead of throwing it away
+                self.branches.setdefault(self.path(), []).append((self.redo_line, self.take_deeper_branches()))
+                self.redo_line = []
+
+        self.board.push(move)
+        self.records.append(record)
+        return record
+
+    def undo(self):
+        if not self.records:
+            return None
+        self.board.pop()
+        record = self.records.pop()
+        self.redo_line.append(record)
+        return record
+
+    def redo(self):
+        if not self.redo_line or not self.board.is_legal(self.redo_line[-1].move):
+            return None
+        record = self.redo_line.pop()
+        self.board.push(record.move)
+        self.records.append(record)
+        return record
+
+    def add_variation(self, node):
+        # Store a PGN variation starting at the current position, together with the variations nested in it
+        line, deeper = self.variation_line(node, self.board.copy())
+        self.branches.setdefault(self.path(), []).append((line, deeper))
+
+    @classmethod
+    def variation_line(cls, node, board):
+        # Redo line of a chess.pgn node's main line and the branches along it, keyed by their path
+        line, deeper = [], {}
+        while True:
+            line.append(MoveRecord(node.move, board.piece_at(node.move.from_square),
+                                   board.piece_at(node.move.to_square)))
+            board.push(node.move)
+            if not node.variations:
+                break
+            for variation in node.variations[1:]:
+                deeper.setdefault(tuple(board.move_stack), []).append(cls.variation_line(variation, board.copy()))
+            node = node.variations[0]
+        return line[::-1], deeper
+
+    def branches_here(self):
+        return [line for line, _ in self.branches.get(self.path(), [])]
+
+    def switch_branch(self, index=0):
+        # Swap the current redo line, and the branches further down it, with a stored branch at this position
+        lines = self.branches.get(self.path())
+        if not lines or index >= len(lines):
+            return False
+        line, deeper = lines.pop(index)
+        if self.redo_line:
+            lines.append((self.redo_line, self.take_deeper_branches()))
+        self.branches.update(deeper)
+        self.redo_line = line
+        return True
+
+
+class MoveIndex:
+    def __init__(self, board):
+        # From-square -> bitboard of the squares that piece can legally move to
+        self.targets = [chess.BB_EMPTY] * 64
+        # From-square -> bitboard of the target squares reached by promoting
+        self.promotions = [chess.BB_EMPTY] * 64
+        # (from-square, to-square) -> piece types the pawn may promote to
+        self.promotion_pieces = {}
+
+        for move in board.generate_legal_moves():
+            self.targets[move.from_square] |= chess.BB_SQUARES[move.to_square]
+            if move.promotion:
+                self.promotions[move.from_square] |= chess.BB_SQUARES[move.to_square]
+                self.promotion_pieces.setdefault((move.from_square, move.to_square), set()).add(move.promotion)
+
+    def destinations(self, from_square):
+        return chess.SquareSet(self.targets[from_square])
+
+    def is_legal(self, from_square, to_square):
+        return bool(self.targets[from_square] & chess.BB_SQUARES[to_square])
+
+    def is_promotion(self, from_square, to_square):
+        return bool(self.promotions[from_square] & chess.BB_SQUARES[to_square])
+
+    def contains(self, move):
+        # Full move check, a promotion needs one of the allowed pieces and nothing else may carry one
+        if not self.is_legal(move.from_square, move.to_square):
+            return False
+        if self.is_promotion(move.from_square, move.to_square):
+            return move.promotion in self.promotion_pieces[(move.from_square, move.to_square)]
+        return move.promotion is None
+
+
+class OutcomeCache:
+    def __init__(self, max_entries=4096):
+        # Position key -> chess.Outcome, None for a game still going, least recently used first
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(board):
+        # Repetitions only reach back to the last capture or pawn move, so the moves since then belong to the key
+        window = board.halfmove_clock
+        return board._transposition_key(), window, tuple(board.move_stack[-window:]) if window else ()
+
+    def get(self, board):
+        key = self.key(board)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        self.misses += 1
+        with metrics.timer("outcome_seconds"):
+            outcome = board.outcome()
+        self.entries[key] = outcome
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return outcome
+
+
+class PositionInfo:
+    def __init__(self, board):
+        # Everything the renderer derives from a position, computed once per position change
+        self.pieces = board.piece_map()
+        self.kings = {color: board.king(color) for color in chess.COLORS}
+
+        # Squares each side attacks, defended own pieces included
+        self.attacks = {}
+        for color in chess.COLORS:
+            mask = chess.BB_EMPTY
+            for square in chess.scan_forward(board.occupied_co[color]):
+                mask |= board.attacks_mask(square)
+            self.attacks[color] = mask
+        self.threats = self.attacks[not board.turn]  # What the side to move has to watch
+
+        self.checkers = board.checkers_mask()
+        self.checked = chess.BB_EMPTY  # King squares under attack
+        for color, king in self.kings.items():
+            if king is not None and self.attacks[not color] & chess.BB_SQUARES[king]:
+                self.checked |= chess.BB_SQUARES[king]
+
+        self.pinned = chess.BB_EMPTY
+        self.hanging = chess.BB_EMPTY  # Attacked and not defended
+        for color in chess.COLORS:
+            own = board.occupied_co[color] & ~board.kings
+            self.hanging |= own & self.attacks[not color] & ~self.attacks[color]
+            if self.kings[color] is not None:
+                for square in chess.scan_forward(own):
+                    if board.is_pinned(color, square):
+                        self.pinned |= chess.BB_SQUARES[square]
+
+
+class InfoPreview:
+    # Turns game events into move log records, the log formats and writes them off the game loop
+    def __init__(self, session, move_log=None):
+        self.session = session
+        self.move_log = move_log  # Nothing is recorded without one
+        self.count = 0
+
+    @staticmethod
+    def AtNow():
+        return datetime.datetime.now().strftime("%H:%M:%S")
+
+    @staticmethod
+    def TimeNow():
+        return datetime.datetime.now()
+
+    def record(self, event, **fields):
+        if self.move_log is not None:
+            self.move_log.record(event, **fields)
+
+    def game_start(self):
+        self.count = 0
+        self.record(LogEvent.GAME_START, detail=self.session.board.fen())
+
+    def log_move(self, move):
+        # Called before the move is pushed, squares and pieces come straight from the board
+        board = self.session.board
+        piece = board.piece_at(move.from_square)
+        detail = None
+        if board.is_en_passant(move):
+            captured = chess.Piece(chess.PAWN, not board.turn)
+            detail = "en_passant"
+        else:
+            captured = board.piece_at(move.to_square)
+
+        if move.promotion:
+            event = LogEvent.PROMOTION
+        elif board.is_castling(move):
+            event = LogEvent.CASTLE
+        elif captured:
+            event = LogEvent.CAPTURE
+        else:
+            event = LogEvent.MOVE
+
+        self.count += 1
+        self.record(event, count=self.count, piece=piece.symbol(),
+                             from_square=chess.square_name(move.from_square),
+                             to_square=chess.square_name(move.to_square),
+                             captured=captured.symbol() if captured else None,
+                             promotion=chess.Piece(move.promotion, piece.color).symbol() if move.promotion else None,
+                             detail=detail)
+
+    def log_undo(self, move):
+        self.count -= 1
+        self.record(LogEvent.UNDO, count=self.count, from_square=chess.square_name(move.from_square),
+                             to_square=chess.square_name(move.to_square))
+
+    def log_redo(self, move):
+        # Called after the move is pushed again, the moved piece now stands on the target square
+        self.count += 1
+        piece = self.session.board.piece_at(move.to_square)
+        self.record(LogEvent.REDO, count=self.count, piece=piece.symbol() if piece else None,
+                             from_square=chess.square_name(move.from_square),
+                             to_square=chess.square_name(move.to_square),
+                             promotion=piece.symbol() if move.promotion and piece else None)
+
+    def log_hint(self, move):
+        piece = self.session.board.piece_at(move.from_square)
+        self.record(LogEvent.HINT, count=self.count, piece=piece.symbol(),
+                             from_square=chess.square_name(move.from_square),
+                             to_square=chess.square_name(move.to_square))
+
+    def StateArrange(self, position, player=None):
+        if position == "tablebase" and player:
+            position = "tablebase_win"
+        self.record(LogEvent.GAME_END, count=self.count, player=player, detail=position)
+
+
+class GameSession:
+    # One game without any display or engine: moves, undo/redo, outcome and derived state.
+    # Front ends register listeners to repaint, cancel hints and so on after each position change
+    def __init__(self, board=None, move_log=None, outcomes=None):
+        self.board = board if board is not None else chess.Board()
+        self.history = MoveHistory(self.board)  # Undo/redo on top of board.push/board.pop
+        self.info_preview = InfoPreview(self, move_log)
+        self.outcomes = outcomes if outcomes is not None else OutcomeCache()  # Can be shared between sessions
+        self.listeners = []  # Called without arguments after every position change
+
+        # Derived state, built on first use after a position change
+        self.move_index = None
+        self.outcome = None
+        self.outcome_stale = True
+        self.position_info = None
+
+    def position_changed(self):
+        self.move_index = None
+        self.outcome_stale = True
+        self.position_info = None
+        for listener in self.listeners:
+            listener()
+
+    def get_move_index(self):
+        # Built once per position, the first time a piece is selected or a move is applied
+        if self.move_index is None:
+            with metrics.timer("legal_moves_seconds"):
+                self.move_index = MoveIndex(self.board)
+        return self.move_index
+
+    def get_outcome(self):
+        if self.outcome_stale:
+            self.outcome = self.outcomes.get(self.board)
+            self.outcome_stale = False
+        return self.outcome
+
+    def get_position_info(self):
+        if self.position_info is None:
+            with metrics.timer("position_info_seconds"):
+                self.position_info = PositionInfo(self.board)
+        return self.position_info
+
+    def apply_move(self, move):
+        # Every move source ends here: one legality check on the cached move index, one push,
+        # one notification that logs it, makes it undoable and lets front ends repaint
+        if not self.get_move_index().contains(move):
+            return None
+        self.info_preview.log_move(move)
+        record = self.history.push(move)
+        self.position_changed()
+        return record
+
+    def undo(self):
+        last_move = self.history.undo()  # board.pop(), no FEN parsing
+        if last_move is not None:
+            self.info_preview.log_undo(last_move.move)
+            self.position_changed()
+        return last_move
+
+    def redo(self):
+        next_move = self.history.redo()  # board.push() of the undone move
+        if next_move is not None:
+            self.info_preview.log_redo(next_move.move)
+            self.position_changed()
+        return next_move
+
+    def switch_branch(self):
+        return self.history.switch_branch()
+
+    def reset(self, board=None):
+        self.board = board if board is not None else chess.Board()
+        self.history = MoveHistory(self.board)
+        self.info_preview.game_start()
+        self.position_changed()
+
+    def load_game(self, game):
+        # Play the main line of a chess.pgn.Game through the history, then rewind it so redo steps forward
+        self.board = game.board()
+        self.history = MoveHistory(self.board)
+        node = game
+        while node.variations:
+            for variation in node.variations[1:]:
+                self.history.add_variation(variation)  # Other redo lines, keyed by the moves leading to them
+            node = node.variations[0]
+            self.history.push(node.move)
+        while self.history.undo():
+            pass
+        self.info_preview.game_start()
+        self.position_changed()
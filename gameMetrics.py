@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Upper bounds of the histogram buckets, the last bucket is open ended
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+NODE_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+DEPTH_BUCKETS = (1, 2, 4, 6, 8, 10, 12, 15, 18, 21, 25, 30, 40)
+
+
+class Histogram:
+    def __init__(self, name, buckets=TIME_BUCKETS, description=""):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.description = description
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()  # Engine workers record from their own threads
+
+    def histogram(self, name, buckets=TIME_BUCKETS, description=""):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(name, buckets, description)
+            return self.histograms[name]
+
+    def observe(self, name, value, buckets=TIME_BUCKETS):
+        histogram = self.histograms.get(name) or self.histogram(name, buckets)
+        with self.lock:
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def get(self, name):
+        histogram = self.histograms.get(name)
+        return histogram.snapshot() if histogram else None
+
+    def snapshot(self):
+        with self.lock:
+            return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="chessgame"):
+        lines = []
+        with self.lock:
+            for name, histogram in self.histograms.items():
+                metric = f"{prefix}_{name}"
+                if histogram.description:
+                    lines.append(f"# HELP {metric} {histogram.description}")
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum {histogram.total}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # Format follows the file extension, .prom for Prometheus text, JSON otherwise
+        with open(path, "w") as file:
+            file.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+    def report(self):
+        lines = []
+        for name, values in self.snapshot().items():
+            if not values["count"]:
+                continue
+            if name.endswith("_seconds"):
+                lines.append(f"{name.ljust(28)} n={values['count']:<8} avg={values['mean'] * 1000:.3f} ms  "
+                             f"p95={values['p95'] * 1000:.3f} ms  max={values['max'] * 1000:.3f} ms")
+            else:
+                lines.append(f"{name.ljust(28)} n={values['count']:<8} avg={values['mean']:.1f}  "
+                             f"p95={values['p95']:.0f}  max={values['max']:.0f}")
+        return "\n".join(lines)
+
+
+class StartupProfile:
+    # Launch timeline, phases on the engine startup thread overlap with the ones drawing the first frame
+    def __init__(self):
+        self.origin = time.perf_counter()  # When this module was imported, the game imports it first
+        self.phases = []  # (name, thread, start since origin, duration)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    def mark(self, name):
+        # A milestone, e.g. all imports done or the first frame on screen
+        now = time.perf_counter()
+        self.add(name, now, now)
+
+    def add(self, name, start, end):
+        with self.lock:
+            self.phases.append((name, threading.current_thread().name, start - self.origin, end - start))
+
+    def report(self):
+        lines = ["Startup (ms since launch)"]
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[2] + phase[3])
+        for name, thread, start, duration in phases:
+            took = f"{duration * 1000:8.1f} ms" if duration else " " * 11
+            lines.append(f"  {(start + duration) * 1000:8.1f}  {took}  {name.ljust(20)} [{thread}]")
+        return "\n".join(lines)
+
+
+# Process-wide registry used by the game, hints and the computer player
+metrics = Metrics()
+metrics.histogram("render_frame_seconds", description="Time to draw one frame that had dirty squares")
+metrics.histogram("event_loop_lag_seconds", description="Time between two event queue polls while drawing")
+metrics.histogram("legal_moves_seconds", description="Legal move generation for a selected piece")
+metrics.histogram("outcome_seconds", description="Game outcome check after a position change")
+metrics.histogram("position_info_seconds", description="Attack maps, checks and pins after a position change")
+metrics.histogram("tablebase_probe_seconds", description="Syzygy tablebase move for a hint or computer move")
+metrics.histogram("book_lookup_seconds", description="Opening book lookup for a hint or computer move")
+metrics.histogram("engine_request_seconds", description="Hint or computer move request until the result arrives")
+metrics.histogram("engine_nodes", NODE_BUCKETS, "Nodes searched per hint or computer move")
+metrics.histogram("engine_depth", DEPTH_BUCKETS, "Search depth reached per hint or computer move")
+
+# Filled in while the game starts, printed on exit
+startup = StartupProfile()
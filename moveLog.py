@@ -0,0 +1,232 @@
+import json
+import sys
+import threading
+import time
+from collections import namedtuple
+import chess
+
+
+class LogEvent:
+    GAME_START = "game_start"
+    MOVE = "move"
+    CAPTURE = "capture"
+    CASTLE = "castle"
+    PROMOTION = "promotion"
+    UNDO = "undo"
+    REDO = "redo"
+    HINT = "hint"
+    GAME_END = "game_end"
+
+
+# Plain values only (square names, piece symbols), so every sink can serialise a record as it is
+LogRecord = namedtuple("LogRecord", ["event", "timestamp", "count", "piece", "from_square", "to_square", "captured",
+                                     "promotion", "player", "detail"])
+LogRecord.__new__.__defaults__ = (None,) * 8
+
+
+class MoveLog:
+    def __init__(self, sinks=(), flush_interval=0.25, max_buffer=256):
+        self.sinks = list(sinks)
+        self.flush_interval = flush_interval  # Seconds between background flushes
+        self.max_buffer = max_buffer  # Flush early when this many records are waiting
+
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+
+        self.writer = threading.Thread(target=self.writer_loop, name="move-log", daemon=True)
+        self.writer.start()
+
+    def add_sink(self, sink):
+        with self.lock:
+            self.sinks.append(sink)
+
+    def record(self, event, **fields):
+        # Called on the game loop, only appends, formatting and I/O happen on the writer thread
+        record = LogRecord(event, time.time(), **fields)
+        with self.lock:
+            self.buffer.append(record)
+            full = len(self.buffer) >= self.max_buffer
+        if full:
+            self.wakeup.set()
+        return record
+
+    def writer_loop(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            records, self.buffer = self.buffer, []
+            sinks = list(self.sinks)
+        if not records:
+            return
+        for sink in sinks:
+            try:
+                sink.write(records)
+            except (OSError, ValueError) as e:
+                print(f"Error: Move log sink {type(sink).__name__} failed\n{e}", file=sys.stderr)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup.set()
+        self.writer.join(timeout=5)
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+
+
+class ConsoleSink:
+    # The lines InfoPreview used to print, written once per flush instead of once per move
+    PIECE_NAMES = {chess.PAWN: "Pawn", chess.KNIGHT: "Knight", chess.BISHOP: "Bishop", chess.ROOK: "Rook",
+                   chess.QUEEN: "Queen", chess.KING: "King"}
+
+    GAME_END_LINES = {
+        "Abandoned": "Game Abandoned",
+        "Drawn": "Match Drawn - Fivefold Repetition",
+        "ins_met": "Insufficient Material - Match Drawn !",
+        "fifty_moves": "Fifty Moves - Match Drawn !",
+        "Check Mate": "Check Mate & {player} Player Won the Game",
+        "Stalemate": "Stalemate !",
+        "resign": "{player} Player Resigned",
+        "tablebase": "Tablebase Draw - Match Drawn !",
+        "tablebase_win": "Tablebase Win & {player} Player Won the Game",
+    }
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    @classmethod
+    def piece_name(cls, symbol):
+        piece = chess.Piece.from_symbol(symbol)
+        return f"{'White' if piece.color else 'Black'} {cls.PIECE_NAMES[piece.piece_type]}"
+
+    def format(self, record):
+        at = time.strftime("%H:%M:%S", time.localtime(record.timestamp))
+        step = str(record.count).ljust(4)
+
+        if record.event == LogEvent.GAME_START:
+            return None
+        if record.event == LogEvent.HINT:
+            return (f"     [{at}] Suggested: {self.piece_name(record.piece)} Move from {record.from_square} "
+                    f"to {record.to_square}")
+        if record.event == LogEvent.UNDO:
+            return f"[{at}] Undo Moved from {record.to_square} to {record.from_square}"
+        if record.event == LogEvent.REDO:
+            return f"[{at}] Redo Moved from {record.from_square} to {record.to_square}"
+        if record.event == LogEvent.GAME_END:
+            line = self.GAME_END_LINES.get(record.detail, record.detail).format(player=record.player)
+            return f"👉   [{at}] {line}\n👉   Total Steps : {record.count}"
+
+        line = f"{step} [{at}] {self.piece_name(record.piece)} Moved from {record.from_square} to {record.to_square}"
+        if record.event == LogEvent.CASTLE:
+            line += " & Castled"
+        elif record.event == LogEvent.PROMOTION:
+            line += f" & Got a Promotion as a {self.piece_name(record.promotion)}"
+
+        if record.detail == "en_passant":
+            captured = "White" if record.captured == "P" else "Black"
+            line += f"\n     [{at}] Pawn En Passant [{captured} Pawn Captured]"
+        elif record.captured:
+            line += f"\n     [{at}] {self.piece_name(record.piece)}  captures {self.piece_name(record.captured)}"
+        return line
+
+    def write(self, records):
+        lines = [line for line in map(self.format, records) if line is not None]
+        if lines:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.file = open(path, "a")
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record._asdict()) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class PgnSink:
+    # Replays the records on its own board and writes each game as PGN when the next one starts or the log closes.
+    # A game can go on after GAME_END (a dialog cancelled, a tablebase result played out), so that only sets the result
+    RESULTS = {"white": "1-0", "black": "0-1"}
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+        self.board = chess.Board()
+        self.started = time.localtime()
+        self.end = None  # GAME_END record of the position on the board, None once play goes on
+        self.in_sync = True  # False after a move that does not fit the board, the rest of that game is skipped
+
+    def write(self, records):
+        for record in records:
+            if record.event == LogEvent.GAME_START:
+                self.write_game()
+                self.board = chess.Board(record.detail) if record.detail else chess.Board()
+                self.started = time.localtime(record.timestamp)
+                self.end = None
+                self.in_sync = True
+            elif not self.in_sync:
+                continue
+            elif record.event in (LogEvent.MOVE, LogEvent.CAPTURE, LogEvent.CASTLE, LogEvent.PROMOTION,
+                                  LogEvent.REDO):
+                move = chess.Move(chess.parse_square(record.from_square), chess.parse_square(record.to_square),
+                                  chess.Piece.from_symbol(record.promotion).piece_type if record.promotion else None)
+                if not self.board.is_legal(move):
+                    print(f"Error: Move log PGN skips the rest of the game, {move} is illegal in "
+                          f"{self.board.fen()}", file=sys.stderr)
+                    self.in_sync = False
+                    continue
+                self.board.push(move)
+                self.end = None
+            elif record.event == LogEvent.UNDO and self.board.move_stack:
+                self.board.pop()
+                self.end = None
+            elif record.event == LogEvent.GAME_END:
+                self.end = record
+        self.file.flush()
+
+    def result(self):
+        outcome = self.board.outcome(claim_draw=True)
+        if outcome is not None:
+            return outcome.result()
+        if self.end is None:
+            return "*"
+        if self.end.detail in ("resign", "tablebase_win") and self.end.player:
+            # Resigned player loses, tablebase winner wins
+            winner = self.end.player.lower()
+            if self.end.detail == "resign":
+                winner = "black" if winner == "white" else "white"
+            return self.RESULTS[winner]
+        if self.end.detail == "tablebase":
+            return "1/2-1/2"
+        return "*"
+
+    def write_game(self):
+        if not self.board.move_stack:
+            return
+        import chess.pgn  # chess.pgn pulls in chess.engine and asyncio, only worth it once there is a game to write
+
+        game = chess.pgn.Game.from_board(self.board)
+        game.headers["Event"] = "Chess Game"
+        game.headers["Date"] = time.strftime("%Y.%m.%d", self.started)
+        game.headers["Result"] = self.result()
+        print(game, file=self.file, end="\n\n")
+        self.board = chess.Board()
+
+    def close(self):
+        self.write_game()
+        self.file.close()
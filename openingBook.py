@@ -0,0 +1,58 @@
+import os
+import random
+import chess
+import chess.polyglot
+
+
+class OpeningBook:
+    def __init__(self, path, selection="weighted", seed=None):
+        self.path = path
+        self.selection = selection  # "weighted" picks in proportion to the book weights, "best" the heaviest move
+        self.random = random.Random(seed)
+
+        # Memory-mapped, a lookup is a binary search straight in the file
+        self.reader = chess.polyglot.open_reader(path)
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        # Load a Polyglot .bin book, or return None when there is none
+        if not path or not os.path.isfile(path):
+            return None
+        try:
+            book = cls(path, **kwargs)
+        except (OSError, ValueError) as e:
+            print(f"Error: Opening book could not be loaded from {path}\n{e}")
+            return None
+
+        print(f"[+] Opening Book Loaded ! ({path})")
+        return book
+
+    def lookup(self, board):
+        if self.reader is None:
+            return None
+        try:
+            if self.selection == "best":
+                entry = self.reader.find(board)
+            else:
+                entry = self.reader.weighted_choice(board, random=self.random)
+        except IndexError:
+            self.misses += 1  # Out of book
+            return None
+
+        self.hits += 1
+        return entry.move
+
+    def moves(self, board):
+        # Every book move for the position with its weight, heaviest first
+        if self.reader is None:
+            return []
+        entries = sorted(self.reader.find_all(board), key=lambda entry: entry.weight, reverse=True)
+        return [(entry.move, entry.weight) for entry in entries]
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
@@ -0,0 +1,124 @@
+import io
+import os
+import struct
+from array import array
+import chess.pgn
+
+
+class PgnDatabase:
+    # Random access to the games of a PGN file by number, the file itself is never loaded as a whole
+    INDEX_MAGIC = b"PGNIDX1\n"
+    INDEX_HEADER = struct.Struct("<8sQQ")  # Magic, file size, modification time in ns
+    CHUNK_SIZE = 1 << 23  # Bytes read per step while indexing
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + ".idx"
+        self.offsets = array("Q")  # Byte offset of every game, 8 bytes per game
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        database = cls(path, **kwargs)
+        if not database.load_index():
+            database.build_index()
+            database.save_index()
+        return database
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def signature(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def load_index(self):
+        # A saved index is only used while the PGN file is unchanged
+        try:
+            with open(self.index_path, "rb") as file:
+                magic, size, mtime = self.INDEX_HEADER.unpack(file.read(self.INDEX_HEADER.size))
+                if magic != self.INDEX_MAGIC or (size, mtime) != self.signature():
+                    return False
+                offsets = array("Q")
+                offsets.frombytes(file.read())
+        except (OSError, struct.error, ValueError):
+            return False
+
+        self.offsets = offsets
+        return True
+
+    def save_index(self):
+        try:
+            with open(self.index_path, "wb") as file:
+                file.write(self.INDEX_HEADER.pack(self.INDEX_MAGIC, *self.signature()))
+                self.offsets.tofile(file)
+        except OSError:
+            pass  # Read-only location, the index is rebuilt next time
+
+    def build_index(self):
+        # Scan for '[Event ' at the start of a line without parsing any moves, a chunk at a time
+        self.offsets = array("Q")
+        pattern = b"\n[Event "
+
+        with open(self.path, "rb") as file:
+            start = 3 if file.read(3) == b"\xef\xbb\xbf" else 0  # UTF-8 byte order mark
+            file.seek(start)
+            if file.read(len(pattern) - 1) == pattern[1:]:
+                self.offsets.append(start)
+            file.seek(start)
+
+            # The tail of each chunk is kept so a tag split across two chunks is still found
+            tail = b""
+            tail_offset = start
+            while True:
+                chunk = file.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                data = tail + chunk
+                position = data.find(pattern)
+                while position != -1:
+                    self.offsets.append(tail_offset + position + 1)
+                    position = data.find(pattern, position + 1)
+                tail = data[-(len(pattern) - 1):]
+                tail_offset += len(data) - len(tail)
+
+        if not self.offsets and os.path.getsize(self.path):
+            self.build_index_slow()
+
+    def build_index_slow(self):
+        # Games without Event tags, a game starts at the first tag line after movetext
+        with open(self.path, "rb") as file:
+            offset = 0
+            in_headers = False
+            for line in file:
+                stripped = line.strip()
+                if stripped.startswith(b"["):
+                    if not in_headers:
+                        self.offsets.append(offset)
+                        in_headers = True
+                elif stripped:
+                    in_headers = False
+                offset += len(line)
+
+    def open_at(self, number):
+        raw = open(self.path, "rb")
+        raw.seek(self.offsets[number])
+        return io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace")
+
+    def read_game(self, number):
+        with self.open_at(number) as file:
+            return chess.pgn.read_game(file)
+
+    def read_headers(self, number):
+        with self.open_at(number) as file:
+            return chess.pgn.read_headers(file)
+
+    def games(self, start=0):
+        # Streams games one after the other, memory stays flat however large the file is
+        if start >= len(self.offsets):
+            return
+        with self.open_at(start) as file:
+            while True:
+                game = chess.pgn.read_game(file)
+                if game is None:
+                    break
+                yield game
@@ -0,0 +1,412 @@
+import threading
+import time
+import chess
+import chess.engine
+
+
+# Scores are in centipawns from the side to move, mates count down from MATE by ply
+MATE = 100000
+MATE_BOUND = MATE - 512
+INFINITE = 1000000
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 320, chess.BISHOP: 330, chess.ROOK: 500, chess.QUEEN: 900,
+                chess.KING: 0}
+
+# Piece-square tables from White's point of view, first row is rank 8
+PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20)
+ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0)
+QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20)
+KING_MIDDLE_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20)
+KING_END_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50)
+
+PIECE_TABLES = {chess.PAWN: PAWN_TABLE, chess.KNIGHT: KNIGHT_TABLE, chess.BISHOP: BISHOP_TABLE,
+                chess.ROOK: ROOK_TABLE, chess.QUEEN: QUEEN_TABLE}
+
+# Material left on the board decides how much the king table leans towards the endgame
+PHASE_WEIGHTS = {chess.KNIGHT: 1, chess.BISHOP: 1, chess.ROOK: 2, chess.QUEEN: 4}
+FULL_PHASE = 24
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchEngine:
+    # In-process stand-in for chess.engine.SimpleEngine, used by EnginePool when Stockfish is missing
+    def __init__(self, hash_size=16):
+        self.id = {"name": "ChessGame Search", "author": "chessGame"}
+        self.options = {"Hash": hash_size}  # Only options this engine understands, see EnginePool.start_engine
+
+        self.table = {}  # Transposition key -> (depth, flag, score, move)
+        self.history = {}  # (color, from, to) -> cutoff bonus of quiet moves
+        self.killers = []
+
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.stop_event = None
+        self.abortable = False
+
+    def configure(self, options):
+        for name, value in options.items():
+            if name in self.options:
+                self.options[name] = value
+
+    def quit(self):
+        self.table.clear()
+        self.history.clear()
+
+    def analyse(self, board, limit, **_kwargs):
+        return self.search(board, limit)
+
+    def analysis(self, board, limit=None, **_kwargs):
+        return SearchAnalysis(self, board, limit)
+
+    def play(self, board, limit, **_kwargs):
+        info = self.search(board, limit)
+        pv = info.get("pv") or [None]
+        return chess.engine.PlayResult(pv[0], pv[1] if len(pv) > 1 else None, info)
+
+    def search(self, board, limit=None, stop_event=None, on_info=None):
+        # Iterative deepening until the time, node or depth budget of the limit runs out
+        limit = limit or chess.engine.Limit()
+        board = board.copy()
+        start = time.perf_counter()
+
+        self.nodes = 0
+        self.deadline = start + limit.time if limit.time else None
+        self.max_nodes = limit.nodes
+        self.stop_event = stop_event
+        self.killers = [[None, None] for _ in range(256)]
+        self.history = {key: value // 2 for key, value in self.history.items()}  # Age the old counters
+
+        # Roughly 100 bytes per table entry, start over when the Hash budget is spent
+        if len(self.table) > self.options["Hash"] * 10000:
+            self.table.clear()
+
+        # Positions since the last irreversible move, for repetition draws inside the search
+        self.path = []
+        replay = board.copy()
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            replay.pop()
+            self.path.append(replay._transposition_key())
+        self.path.reverse()
+
+        info = {}
+        if board.is_game_over():
+            return {"depth": 0, "nodes": 0, "time": 0.0}
+
+        for depth in range(1, (limit.depth or 64) + 1):
+            # The first iteration always finishes so there is a move to return
+            self.abortable = depth > 1
+            try:
+                score = self.negamax(board, depth, -INFINITE, INFINITE, 0)
+            except SearchTimeout:
+                break
+
+            elapsed = time.perf_counter() - start
+            info = {
+                "depth": depth,
+                "score": chess.engine.PovScore(self.to_engine_score(score), board.turn),
+                "pv": self.principal_variation(board, depth),
+                "nodes": self.nodes,
+                "time": elapsed,
+                "nps": int(self.nodes / elapsed) if elapsed else 0,
+            }
+            if on_info:
+                on_info(info)
+
+            if abs(score) >= MATE_BOUND:
+                break  # A forced mate will not get any shorter
+            if self.deadline and time.perf_counter() + elapsed > self.deadline:
+                break  # The next iteration takes longer than this one, it would not finish
+
+        return info
+
+    def check_budget(self):
+        if not self.abortable:
+            return
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout
+        if self.deadline and time.perf_counter() >= self.deadline:
+            raise SearchTimeout
+        if self.max_nodes and self.nodes >= self.max_nodes:
+            raise SearchTimeout
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self.check_budget()
+
+        # python-chess' own position key, far cheaper than a Zobrist hash from scratch
+        key = board._transposition_key()
+        reversible = board.halfmove_clock
+        if ply and reversible and (reversible >= 100 or key in self.path[-reversible:]):
+            return 0
+
+        in_check = board.is_check()
+        if in_check:
+            depth += 1  # Check extension, never stand pat while in check
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta, ply)
+
+        tt_move = None
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, flag, score, tt_move = entry
+            if ply and entry_depth >= depth:
+                score = self.from_table(score, ply)
+                if flag == EXACT or (flag == LOWER and score >= beta) or (flag == UPPER and score <= alpha):
+                    return score
+
+        original_alpha = alpha
+        best_score = -INFINITE
+        best_move = None
+        searched = 0
+
+        self.path.append(key)
+        try:
+            for move in self.ordered_moves(board, tt_move, ply):
+                quiet = not board.is_capture(move) and not move.promotion
+                board.push(move)
+                if searched == 0:
+                    score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    # Later moves only have to prove they are no better, re-search the ones that are
+                    score = -self.negamax(board, depth - 1, -alpha - 1, -alpha, ply + 1)
+                    if alpha < score < beta:
+                        score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+                board.pop()
+                searched += 1
+
+                if score > best_score:
+                    best_score = score
+                    best_move = move
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            if quiet:
+                                self.remember_cutoff(board.turn, move, depth, ply)
+                            break
+        finally:
+            self.path.pop()
+
+        if searched == 0:
+            return -MATE + ply if in_check else 0
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, flag, self.to_table(best_score, ply), best_move)
+        return best_score
+
+    def quiescence(self, board, alpha, beta, ply):
+        # Only captures, so the evaluation is not taken in the middle of an exchange
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self.check_budget()
+
+        stand_pat = self.evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        for move in sorted(board.generate_legal_captures(), key=lambda m: self.capture_order(board, m),
+                           reverse=True):
+            board.push(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            board.pop()
+
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    @staticmethod
+    def capture_order(board, move):
+        # MVV-LVA, most valuable victim first, cheapest attacker breaks ties
+        victim = board.piece_type_at(move.to_square) or chess.PAWN  # En passant lands on an empty square
+        return 10 * victim - board.piece_type_at(move.from_square)
+
+    def ordered_moves(self, board, tt_move, ply):
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        scored = []
+        for move in board.generate_legal_moves():
+            if move == tt_move:
+                order = 1000000
+            elif board.is_capture(move):
+                order = 100000 + self.capture_order(board, move)
+            elif move.promotion:
+                order = 90000 + move.promotion
+            elif move in killers:
+                order = 80000 + (killers[0] == move)
+            else:
+                order = min(self.history.get((board.turn, move.from_square, move.to_square), 0), 79999)
+            scored.append((order, move))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def remember_cutoff(self, color, move, depth, ply):
+        if ply < len(self.killers):
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        key = (color, move.from_square, move.to_square)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def principal_variation(self, board, depth):
+        # Follow the best moves stored in the table, stop at anything that is not legal here
+        pv = []
+        seen = set()
+        board = board.copy(stack=False)
+        while len(pv) < depth:
+            key = board._transposition_key()
+            entry = self.table.get(key)
+            if entry is None or entry[3] is None or key in seen or not board.is_legal(entry[3]):
+                break
+            seen.add(key)
+            pv.append(entry[3])
+            board.push(entry[3])
+        return pv
+
+    @staticmethod
+    def evaluate(board):
+        # Material and piece-square tables, tapered for the king, from the side to move
+        score = 0
+        phase = 0
+        king_middle = king_end = 0
+
+        for color in chess.COLORS:
+            sign = 1 if color == chess.WHITE else -1
+            flip = 56 if color == chess.WHITE else 0  # Tables are written with rank 8 first
+
+            for piece_type, table in PIECE_TABLES.items():
+                value = PIECE_VALUES[piece_type]
+                for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                    score += sign * (value + table[square ^ flip])
+                    phase += PHASE_WEIGHTS.get(piece_type, 0)
+
+            king_square = board.king(color)
+            if king_square is not None:
+                king_middle += sign * KING_MIDDLE_TABLE[king_square ^ flip]
+                king_end += sign * KING_END_TABLE[king_square ^ flip]
+
+        phase = min(phase, FULL_PHASE)
+        score += (king_middle * phase + king_end * (FULL_PHASE - phase)) // FULL_PHASE
+        return score if board.turn == chess.WHITE else -score
+
+    @staticmethod
+    def to_table(score, ply):
+        # Mate scores are stored relative to the node, not the root
+        if score >= MATE_BOUND:
+            return score + ply
+        if score <= -MATE_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def from_table(score, ply):
+        if score >= MATE_BOUND:
+            return score - ply
+        if score <= -MATE_BOUND:
+            return score + ply
+        return score
+
+    @staticmethod
+    def to_engine_score(score):
+        if score >= MATE_BOUND:
+            return chess.engine.Mate((MATE - score + 1) // 2)
+        if score <= -MATE_BOUND:
+            return chess.engine.Mate(-((MATE + score) // 2))
+        return chess.engine.Cp(score)
+
+
+class SearchAnalysis:
+    # Same shape as chess.engine.SimpleAnalysisResult as far as Hint uses it: info, wait() and stop()
+    def __init__(self, engine, board, limit):
+        self.info = {}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(engine, board.copy(), limit), name="search-analysis",
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self, engine, board, limit):
+        self.info = engine.search(board, limit, self.stop_event, self.update)
+
+    def update(self, info):
+        self.info = info
+
+    def wait(self):
+        self.thread.join()
+        pv = self.info.get("pv") or [None]
+        return chess.engine.BestMove(pv[0], pv[1] if len(pv) > 1 else None)
+
+    def stop(self):
+        self.stop_event.set()
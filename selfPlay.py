@@ -0,0 +1,191 @@
+import argparse
+import json
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import util
+import chess
+import chess.engine
+import chess.pgn
+from enginePool import EnginePool
+from engineLocator import EngineLocator
+from openingBook import OpeningBook
+
+
+# One engine per worker process, created by worker_init
+worker_pool = None
+worker_book = None
+
+
+def worker_init(engine_path, threads, hash_size, options, book_path=None):
+    global worker_pool, worker_book
+    worker_pool = EnginePool(engine_path, size=1, threads=threads, hash_size=hash_size, options=options)
+    worker_pool.start()
+    worker_book = OpeningBook(book_path) if book_path else None
+
+    # Quit the engine when the worker exits, its reader thread would otherwise keep the process alive
+    util.Finalize(None, worker_pool.close, exitpriority=10)
+
+
+def play_game(game_number, limit, max_plies, random_plies):
+    # Same move choice as autoRunProgram.ComputerPlayer, minus the window and the think delay
+    board = chess.Board()
+    rng = random.Random(game_number)
+    for _ in range(random_plies):
+        moves = list(board.legal_moves)
+        if not moves:
+            break
+        board.push(rng.choice(moves))
+
+    nodes = 0
+    search_time = 0.0
+    book_plies = 0
+    start = time.perf_counter()
+    error = None
+
+    if worker_book is not None:
+        worker_book.random.seed(game_number)  # Weighted book choices, repeatable per game number
+
+    try:
+        with worker_pool.lease() as engine:
+            engine_name = engine.id.get("name", "engine")
+            while not board.is_game_over(claim_draw=True) and board.ply() < max_plies:
+                book_move = worker_book.lookup(board) if worker_book is not None else None
+                if book_move:
+                    board.push(book_move)
+                    book_plies += 1
+                    continue
+
+                result = engine.play(board, limit, game=game_number, info=chess.engine.INFO_BASIC)
+                nodes += result.info.get("nodes", 0)
+                search_time += result.info.get("time", 0.0)
+                if result.move is None:
+                    break
+                board.push(result.move)
+    except chess.engine.EngineError as e:
+        engine_name = "engine"
+        error = str(e)
+
+    outcome = board.outcome(claim_draw=True)
+    if error:
+        termination = "engine_error"
+    elif outcome is not None:
+        termination = outcome.termination.name.lower()
+    else:
+        termination = "max_plies"
+
+    game = chess.pgn.Game.from_board(board)
+    game.headers["Event"] = "Self-play"
+    game.headers["Round"] = str(game_number)
+    game.headers["White"] = engine_name
+    game.headers["Black"] = engine_name
+    game.headers["Result"] = outcome.result() if outcome else "*"
+    game.headers["Termination"] = termination
+
+    return {
+        "game": game_number,
+        "result": game.headers["Result"],
+        "termination": termination,
+        "moves": board.ply(),
+        "book_plies": book_plies,
+        "nodes": nodes,
+        "nps": int(nodes / search_time) if search_time else 0,
+        "seconds": round(time.perf_counter() - start, 3),
+        "error": error,
+        "pgn": str(game),
+    }
+
+
+def parse_options(pairs):
+    options = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        value = value.strip()
+        if value.lower() in ("true", "false"):
+            options[name.strip()] = value.lower() == "true"
+        elif value.lstrip("-").isdigit():
+            options[name.strip()] = int(value)
+        else:
+            options[name.strip()] = value
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine games without a window")
+    parser.add_argument("--engine", default=None, help="UCI binary, found or built by EngineLocator if omitted")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes, one engine each")
+    parser.add_argument("--time", type=float, default=None, help="Seconds per move")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--hash", type=int, default=16)
+    parser.add_argument("--option", action="append", default=[], help="Extra UCI option, e.g. 'Skill Level=10'")
+    parser.add_argument("--max-plies", type=int, default=400)
+    parser.add_argument("--random-plies", type=int, default=0, help="Random opening plies, seeded by game number")
+    parser.add_argument("--book", default=None, help="Polyglot .bin book played before the engine is asked")
+    parser.add_argument("--pgn", default="selfplay.pgn")
+    parser.add_argument("--summary", default="selfplay.json")
+    args = parser.parse_args()
+
+    options = parse_options(args.option)
+    if args.engine is None:
+        args.engine, engine_options = EngineLocator().locate()
+        if args.engine is None:
+            parser.error("no Stockfish binary found and the bundled source could not be built, pass --engine")
+        options = {**engine_options, **options}
+
+    limit = chess.engine.Limit(time=args.time, depth=args.depth, nodes=args.nodes)
+    if args.time is None and args.depth is None and args.nodes is None:
+        limit = chess.engine.Limit(time=0.1)
+
+    results = []
+    start = time.perf_counter()
+    print(f"👉   Self-play : {args.games} games on {args.workers} workers ({limit})")
+
+    with open(args.pgn, "w") as pgn_file, ProcessPoolExecutor(
+            max_workers=args.workers, initializer=worker_init,
+            initargs=(args.engine, args.threads, args.hash, options, args.book)) as executor:
+        futures = [executor.submit(play_game, number, limit, args.max_plies, args.random_plies)
+                   for number in range(1, args.games + 1)]
+
+        for future in as_completed(futures):
+            result = future.result()
+
+            # Stream every finished game so an interrupted run still leaves usable output
+            print(result.pop("pgn"), file=pgn_file, end="\n\n")
+            pgn_file.flush()
+            results.append(result)
+
+            print(f"{str(len(results)).ljust(6)} Game {result['game']}: {result['result']} "
+                  f"({result['termination']}, {result['moves']} plies, {result['nps']} nps)")
+
+    wall = time.perf_counter() - start
+    results.sort(key=lambda r: r["game"])
+    scores = Counter(r["result"] for r in results)
+    total_nodes = sum(r["nodes"] for r in results)
+    total_search = sum(r["nodes"] / r["nps"] for r in results if r["nps"])
+
+    summary = {
+        "games": len(results),
+        "white_wins": scores["1-0"],
+        "black_wins": scores["0-1"],
+        "draws": scores["1/2-1/2"],
+        "unfinished": scores["*"],
+        "terminations": dict(Counter(r["termination"] for r in results)),
+        "average_moves": round(sum(r["moves"] for r in results) / len(results), 1) if results else 0,
+        "nps": int(total_nodes / total_search) if total_search else 0,
+        "wall_seconds": round(wall, 3),
+        "limit": {"time": args.time, "depth": args.depth, "nodes": args.nodes},
+        "results": results,
+    }
+    with open(args.summary, "w") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+
+    print(f"👉   +{summary['white_wins']} -{summary['black_wins']} ={summary['draws']} "
+          f"in {summary['wall_seconds']} s, PGN : {args.pgn}, Summary : {args.summary}")
+
+
+if __name__ == "__main__":
+    main()